@@ -1,551 +1,100 @@
 # Food Health Rating App
 # A comprehensive system for rating packaged foods based on authoritative health guidelines
+#
+# The Streamlit UI. Products, scoring and storage live in core.py and are
+# re-exported here, so `from app import HealthScorer` keeps working.
 
 import streamlit as st
-import json
-import sqlite3
-import hashlib
-import datetime
-import re
 import logging
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Tuple
-from pathlib import Path
+from typing import Dict, List, Optional
+import os
+import time
 import requests
 import pandas as pd
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('food_rating.log'),
-        logging.StreamHandler()
-    ]
+from core import (
+    CONFIG_PATH, OFF_NUTRIMENT_FIELDS, BackgroundWriter, ConnectionPool, HealthScore, HealthScorer,
+    IngredientMatcher, IngredientNormalizer, LRUCache, NutrientInfo, NutrientNormalizer, NutrientRule,
+    OCRBusyError, OCRService, ProductData, ProductDatabase, ProductJob, RuleSet, ScoreDriver,
+    build_product_pipeline, load_config, product_from_open_food_facts, product_from_record
 )
+from label_parser import parse_label_text
+from logging_config import configure_logging
+from metrics import METRICS, MetricsRegistry, serve_metrics
+from openfoodfacts_client import OpenFoodFactsClient
+from pipeline import Pipeline
+
 logger = logging.getLogger(__name__)
 
-@dataclass
-class NutrientInfo:
-    """Standardized nutrient information"""
-    name: str
-    value: float
-    unit: str
-    per_100g: float  # normalized to 100g for comparison
+# Queued, rotating log output as set in the logging section of config.yaml
+configure_logging(load_config().get("logging", {}))
 
-@dataclass
-class ProductData:
-    """Normalized product information"""
-    barcode: Optional[str] = None
-    name: str = ""
-    brand: str = ""
-    ingredients: List[str] = None
-    nutrients: Dict[str, NutrientInfo] = None
-    serving_size_g: Optional[float] = None
-    categories: List[str] = None
-    
-    def __post_init__(self):
-        if self.ingredients is None:
-            self.ingredients = []
-        if self.nutrients is None:
-            self.nutrients = {}
-        if self.categories is None:
-            self.categories = []
+# Streamlit UI
 
-@dataclass
-class ScoreDriver:
-    """Individual scoring factor"""
-    factor: str
-    impact: str  # positive, negative, neutral
-    score_delta: float
-    explanation: str
-    source: str
+# Read-only query results are shared across sessions for this long
+DATA_CACHE_TTL_SECONDS = 10
+
+@st.cache_resource
+def get_database() -> ProductDatabase:
+    """Process-wide database shared by every session; its pool and caches are thread-safe"""
+    return ProductDatabase()
+
+@st.cache_resource
+def get_scorer() -> HealthScorer:
+    """Process-wide scorer shared by every session"""
+    return HealthScorer()
+
+@st.cache_resource
+def get_off_client() -> OpenFoodFactsClient:
+    """Process-wide Open Food Facts client so its connection pool is reused"""
+    return OpenFoodFactsClient.from_config(load_config().get("openfoodfacts") or {})
+
+@st.cache_resource
+def get_ocr_service() -> OCRService:
+    """Process-wide OCR pool, so its workers and text cache are shared by every session"""
+    config = load_config()
+    settings = config.get("ocr") or {}
+    # Only override pytesseract's PATH lookup when the configured binary exists
+    tesseract_cmd = config.get("ocr_tesseract_path")
+    if tesseract_cmd and not os.path.isfile(tesseract_cmd):
+        tesseract_cmd = None
+    return OCRService(
+        workers=settings.get("workers", 2),
+        max_queue=settings.get("max_queue", 8),
+        cache_size=settings.get("cache_size", 256),
+        tesseract_cmd=tesseract_cmd,
+        preprocess=settings.get("preprocess")
+    )
 
-@dataclass
-class HealthScore:
-    """Complete health assessment"""
-    overall_score: int  # 0-100
-    band: str  # A, B, C, D, E
-    drivers: List[ScoreDriver]
-    evidence_sources: List[str]
-    confidence: str  # high, medium, low
-    warnings: List[str]
+@st.cache_resource
+def get_pipeline() -> Pipeline:
+    """Process-wide product pipeline; saves go to the shared background writer"""
+    return build_product_pipeline(get_scorer(), get_database(), persist_async=True)
+
+@st.cache_resource
+def init_metrics() -> MetricsRegistry:
+    """Apply the config.yaml `metrics` section once per process"""
+    settings = load_config().get("metrics") or {}
+    METRICS.enabled = bool(settings.get("enabled", False))
+    if settings.get("http_port"):
+        try:
+            serve_metrics(METRICS, int(settings["http_port"]))
+        except OSError as e:
+            logger.warning(f"Could not serve metrics on port {settings['http_port']}: {e}")
+    return METRICS
 
-class IngredientNormalizer:
-    """Normalize and classify ingredients using food science principles"""
-    
-    # Based on FDA and EFSA ingredient classification systems
-    HARMFUL_ADDITIVES = {
-        'sodium nitrite', 'sodium nitrate', 'potassium nitrite', 'potassium nitrate',
-        'bha', 'bht', 'tbhq', 'propyl gallate',
-        'artificial colors', 'red dye 40', 'yellow 6', 'blue 1',
-        'high fructose corn syrup', 'corn syrup solids'
-    }
-    
-    ULTRA_PROCESSED_MARKERS = {
-        'modified starch', 'hydrolyzed protein', 'isolated protein',
-        'artificial flavors', 'natural flavors', 'flavor enhancer',
-        'emulsifier', 'stabilizer', 'thickener'
-    }
-    
-    BENEFICIAL_INGREDIENTS = {
-        'whole grain', 'whole wheat', 'oats', 'quinoa', 'brown rice',
-        'fiber', 'protein', 'vitamins', 'minerals'
-    }
+@st.cache_data(ttl=DATA_CACHE_TTL_SECONDS)
+def load_recent_products(limit: int, bands: List[str], confidences: List[str]):
+    return get_database().get_recent_products_with_scores(limit, bands, confidences)
 
-    @staticmethod
-    def normalize_ingredient_list(raw_ingredients: str) -> List[str]:
-        """Convert raw ingredient string to normalized list"""
-        if not raw_ingredients:
-            return []
-        
-        # Clean and split ingredients
-        ingredients = re.split(r'[,;]', raw_ingredients.lower())
-        normalized = []
-        
-        for ingredient in ingredients:
-            ingredient = ingredient.strip()
-            ingredient = re.sub(r'\([^)]*\)', '', ingredient)  # Remove parenthetical content
-            ingredient = re.sub(r'\s+', ' ', ingredient).strip()
-            if ingredient and len(ingredient) > 1:
-                normalized.append(ingredient)
-        
-        logger.info(f"Normalized {len(normalized)} ingredients from raw text")
-        return normalized
+@st.cache_data(ttl=DATA_CACHE_TTL_SECONDS)
+def load_stats() -> Dict[str, object]:
+    return get_database().get_stats()
 
-    @staticmethod
-    def classify_ingredients(ingredients: List[str]) -> Dict[str, List[str]]:
-        """Classify ingredients into categories for scoring"""
-        classification = {
-            'harmful_additives': [],
-            'ultra_processed_markers': [],
-            'beneficial_ingredients': [],
-            'other': []
-        }
-        
-        for ingredient in ingredients:
-            ingredient_lower = ingredient.lower()
-            classified = False
-            
-            for harmful in IngredientNormalizer.HARMFUL_ADDITIVES:
-                if harmful in ingredient_lower:
-                    classification['harmful_additives'].append(ingredient)
-                    classified = True
-                    break
-            
-            if not classified:
-                for marker in IngredientNormalizer.ULTRA_PROCESSED_MARKERS:
-                    if marker in ingredient_lower:
-                        classification['ultra_processed_markers'].append(ingredient)
-                        classified = True
-                        break
-            
-            if not classified:
-                for beneficial in IngredientNormalizer.BENEFICIAL_INGREDIENTS:
-                    if beneficial in ingredient_lower:
-                        classification['beneficial_ingredients'].append(ingredient)
-                        classified = True
-                        break
-            
-            if not classified:
-                classification['other'].append(ingredient)
-        
-        return classification
+@st.cache_data(ttl=DATA_CACHE_TTL_SECONDS)
+def search_products_cached(query: str):
+    return get_database().search_products(query)
 
-class NutrientNormalizer:
-    """Normalize nutrient data using official dietary guidelines"""
-    
-    # Based on FDA Daily Values and WHO recommendations
-    DAILY_VALUES = {
-        'calories': 2000,
-        'total_fat': 65,      # grams
-        'saturated_fat': 20,   # grams
-        'trans_fat': 0,        # grams (no safe level)
-        'cholesterol': 300,    # mg
-        'sodium': 2300,        # mg
-        'total_carbs': 300,    # grams
-        'dietary_fiber': 25,   # grams
-        'total_sugars': 50,    # grams (WHO recommendation)
-        'added_sugars': 25,    # grams (WHO recommendation)
-        'protein': 50,         # grams
-    }
-    
-    @staticmethod
-    def normalize_nutrients(raw_nutrients: Dict[str, str], serving_size_g: float = 100) -> Dict[str, NutrientInfo]:
-        """Convert raw nutrient strings to standardized format"""
-        normalized = {}
-        
-        for key, value_str in raw_nutrients.items():
-            try:
-                # Extract numeric value and unit
-                value_match = re.search(r'(\d+\.?\d*)', str(value_str))
-                if not value_match:
-                    continue
-                    
-                value = float(value_match.group(1))
-                unit_match = re.search(r'(mg|g|kcal|cal)', str(value_str).lower())
-                unit = unit_match.group(1) if unit_match else 'g'
-                
-                # Normalize to per 100g
-                per_100g = (value / serving_size_g) * 100 if serving_size_g > 0 else value
-                
-                # Convert units if needed
-                if unit == 'mg' and key.lower() not in ['sodium', 'cholesterol']:
-                    per_100g = per_100g / 1000  # mg to g
-                    unit = 'g'
-                
-                normalized[key.lower().replace(' ', '_')] = NutrientInfo(
-                    name=key,
-                    value=value,
-                    unit=unit,
-                    per_100g=per_100g
-                )
-                
-            except Exception as e:
-                logger.warning(f"Failed to normalize nutrient {key}: {e}")
-                continue
-        
-        logger.info(f"Normalized {len(normalized)} nutrients")
-        return normalized
-
-class HealthScorer:
-    """Score products based on established nutritional guidelines"""
-    
-    def __init__(self):
-        # Evidence sources - all peer-reviewed and authoritative
-        self.sources = [
-            "FDA Nutrition Facts Label Guidelines (2016)",
-            "WHO Global Strategy on Diet, Physical Activity and Health (2004)",
-            "Dietary Guidelines for Americans 2020-2025",
-            "European Food Safety Authority (EFSA) Scientific Opinions",
-            "American Heart Association Dietary Guidelines",
-            "Harvard T.H. Chan School of Public Health Nutrition Source"
-        ]
-    
-    def score_product(self, product: ProductData) -> HealthScore:
-        """Generate comprehensive health score with evidence"""
-        logger.info(f"Scoring product: {product.name}")
-        
-        base_score = 50  # Start neutral
-        drivers = []
-        warnings = []
-        confidence_factors = []
-        
-        # Score based on nutrients
-        if product.nutrients:
-            nutrient_score, nutrient_drivers, nutrient_warnings = self._score_nutrients(product.nutrients)
-            base_score += nutrient_score
-            drivers.extend(nutrient_drivers)
-            warnings.extend(nutrient_warnings)
-            confidence_factors.append("nutrients")
-        
-        # Score based on ingredients
-        if product.ingredients:
-            ingredient_score, ingredient_drivers, ingredient_warnings = self._score_ingredients(product.ingredients)
-            base_score += ingredient_score
-            drivers.extend(ingredient_drivers)
-            warnings.extend(ingredient_warnings)
-            confidence_factors.append("ingredients")
-        
-        # Ensure score is within bounds
-        final_score = max(0, min(100, int(base_score)))
-        
-        # Determine band (like Nutri-Score)
-        if final_score >= 80:
-            band = "A"
-        elif final_score >= 65:
-            band = "B"
-        elif final_score >= 50:
-            band = "C"
-        elif final_score >= 35:
-            band = "D"
-        else:
-            band = "E"
-        
-        # Determine confidence
-        confidence = self._calculate_confidence(confidence_factors, product)
-        
-        logger.info(f"Final score: {final_score} (Band {band})")
-        
-        return HealthScore(
-            overall_score=final_score,
-            band=band,
-            drivers=drivers,
-            evidence_sources=self.sources,
-            confidence=confidence,
-            warnings=warnings
-        )
-    
-    def _score_nutrients(self, nutrients: Dict[str, NutrientInfo]) -> Tuple[float, List[ScoreDriver], List[str]]:
-        """Score based on nutrient profile"""
-        score_delta = 0
-        drivers = []
-        warnings = []
-        
-        # Positive factors
-        if 'dietary_fiber' in nutrients:
-            fiber = nutrients['dietary_fiber'].per_100g
-            if fiber >= 6:  # High fiber
-                delta = min(10, fiber * 1.5)
-                score_delta += delta
-                drivers.append(ScoreDriver(
-                    factor="High Fiber Content",
-                    impact="positive",
-                    score_delta=delta,
-                    explanation=f"Contains {fiber:.1f}g fiber per 100g. High fiber supports digestive health and may reduce chronic disease risk.",
-                    source="Dietary Guidelines for Americans 2020-2025"
-                ))
-        
-        if 'protein' in nutrients:
-            protein = nutrients['protein'].per_100g
-            if protein >= 12:  # Good protein source
-                delta = min(8, protein * 0.3)
-                score_delta += delta
-                drivers.append(ScoreDriver(
-                    factor="Good Protein Source",
-                    impact="positive",
-                    score_delta=delta,
-                    explanation=f"Contains {protein:.1f}g protein per 100g. Adequate protein supports muscle health and satiety.",
-                    source="FDA Nutrition Facts Label Guidelines"
-                ))
-        
-        # Negative factors
-        if 'sodium' in nutrients:
-            sodium_mg = nutrients['sodium'].per_100g * 10  # Convert to mg per 100g
-            if sodium_mg > 600:  # High sodium
-                delta = -min(15, (sodium_mg - 600) * 0.01)
-                score_delta += delta
-                drivers.append(ScoreDriver(
-                    factor="High Sodium Content",
-                    impact="negative",
-                    score_delta=delta,
-                    explanation=f"Contains {sodium_mg:.0f}mg sodium per 100g. High sodium intake linked to hypertension and cardiovascular disease.",
-                    source="American Heart Association Dietary Guidelines"
-                ))
-                warnings.append("High sodium content may contribute to elevated blood pressure")
-        
-        if 'saturated_fat' in nutrients:
-            sat_fat = nutrients['saturated_fat'].per_100g
-            if sat_fat > 5:  # High saturated fat
-                delta = -min(12, sat_fat * 1.5)
-                score_delta += delta
-                drivers.append(ScoreDriver(
-                    factor="High Saturated Fat",
-                    impact="negative",
-                    score_delta=delta,
-                    explanation=f"Contains {sat_fat:.1f}g saturated fat per 100g. High saturated fat intake may increase cardiovascular risk.",
-                    source="WHO Global Strategy on Diet, Physical Activity and Health"
-                ))
-        
-        if 'total_sugars' in nutrients:
-            sugars = nutrients['total_sugars'].per_100g
-            if sugars > 15:  # High sugar
-                delta = -min(10, sugars * 0.5)
-                score_delta += delta
-                drivers.append(ScoreDriver(
-                    factor="High Sugar Content",
-                    impact="negative",
-                    score_delta=delta,
-                    explanation=f"Contains {sugars:.1f}g sugars per 100g. High sugar intake linked to obesity, diabetes, and dental problems.",
-                    source="WHO Global Strategy on Diet, Physical Activity and Health"
-                ))
-        
-        return score_delta, drivers, warnings
-    
-    def _score_ingredients(self, ingredients: List[str]) -> Tuple[float, List[ScoreDriver], List[str]]:
-        """Score based on ingredient quality"""
-        score_delta = 0
-        drivers = []
-        warnings = []
-        
-        classification = IngredientNormalizer.classify_ingredients(ingredients)
-        
-        # Penalize harmful additives
-        harmful_count = len(classification['harmful_additives'])
-        if harmful_count > 0:
-            delta = -min(15, harmful_count * 5)
-            score_delta += delta
-            drivers.append(ScoreDriver(
-                factor="Harmful Additives Present",
-                impact="negative",
-                score_delta=delta,
-                explanation=f"Contains {harmful_count} potentially harmful additive(s): {', '.join(classification['harmful_additives'][:3])}. Some additives linked to health concerns in studies.",
-                source="EFSA Scientific Opinions on Food Additives"
-            ))
-            warnings.append("Contains additives that some studies suggest may have negative health effects")
-        
-        # Penalize ultra-processed markers
-        processed_count = len(classification['ultra_processed_markers'])
-        if processed_count > 3:
-            delta = -min(8, processed_count * 2)
-            score_delta += delta
-            drivers.append(ScoreDriver(
-                factor="Highly Processed Food",
-                impact="negative",
-                score_delta=delta,
-                explanation=f"Contains {processed_count} ultra-processing markers. Ultra-processed foods associated with increased chronic disease risk.",
-                source="Harvard T.H. Chan School of Public Health"
-            ))
-        
-        # Reward beneficial ingredients
-        beneficial_count = len(classification['beneficial_ingredients'])
-        if beneficial_count > 0:
-            delta = min(10, beneficial_count * 3)
-            score_delta += delta
-            drivers.append(ScoreDriver(
-                factor="Beneficial Ingredients",
-                impact="positive",
-                score_delta=delta,
-                explanation=f"Contains {beneficial_count} beneficial ingredient(s): {', '.join(classification['beneficial_ingredients'][:3])}. These support nutritional quality.",
-                source="Dietary Guidelines for Americans 2020-2025"
-            ))
-        
-        return score_delta, drivers, warnings
-    
-    def _calculate_confidence(self, confidence_factors: List[str], product: ProductData) -> str:
-        """Calculate confidence level in the score"""
-        score = 0
-        
-        if "nutrients" in confidence_factors:
-            score += 50
-        if "ingredients" in confidence_factors:
-            score += 30
-        if product.barcode:
-            score += 10
-        if product.brand:
-            score += 10
-        
-        if score >= 80:
-            return "high"
-        elif score >= 60:
-            return "medium"
-        else:
-            return "low"
-
-class ProductDatabase:
-    """Simple SQLite database for storing product history"""
-    
-    def __init__(self, db_path: str = "products.db"):
-        self.db_path = db_path
-        self._init_database()
-    
-    def _init_database(self):
-        """Initialize the database schema"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    barcode TEXT,
-                    name TEXT NOT NULL,
-                    brand TEXT,
-                    data_hash TEXT UNIQUE,
-                    product_data TEXT,
-                    health_score TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_barcode ON products(barcode)
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_name ON products(name)
-            """)
-    
-    def save_product(self, product: ProductData, score: HealthScore) -> str:
-        """Save product and score to database"""
-        data_hash = hashlib.md5(
-            json.dumps(asdict(product), sort_keys=True).encode()
-        ).hexdigest()
-        
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO products 
-                (barcode, name, brand, data_hash, product_data, health_score, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                product.barcode,
-                product.name,
-                product.brand,
-                data_hash,
-                json.dumps(asdict(product)),
-                json.dumps(asdict(score)),
-                datetime.datetime.now().isoformat()
-            ))
-        
-        logger.info(f"Saved product {product.name} to database")
-        return data_hash
-    
-    def get_product_by_barcode(self, barcode: str) -> Optional[Tuple[ProductData, HealthScore]]:
-        """Retrieve product by barcode"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT product_data, health_score FROM products 
-                WHERE barcode = ? ORDER BY updated_at DESC LIMIT 1
-            """, (barcode,))
-            
-            row = cursor.fetchone()
-            if row:
-                # Load product data and reconstruct NutrientInfo objects
-                product_dict = json.loads(row[0])
-                
-                # Convert nutrient dictionaries back to NutrientInfo objects
-                if 'nutrients' in product_dict and product_dict['nutrients']:
-                    reconstructed_nutrients = {}
-                    for key, nutrient_dict in product_dict['nutrients'].items():
-                        reconstructed_nutrients[key] = NutrientInfo(
-                            name=nutrient_dict['name'],
-                            value=nutrient_dict['value'],
-                            unit=nutrient_dict['unit'],
-                            per_100g=nutrient_dict['per_100g']
-                        )
-                    product_dict['nutrients'] = reconstructed_nutrients
-                
-                product_data = ProductData(**product_dict)
-                
-                # Load health score and reconstruct ScoreDriver objects
-                score_dict = json.loads(row[1])
-                if 'drivers' in score_dict and score_dict['drivers']:
-                    reconstructed_drivers = []
-                    for driver_dict in score_dict['drivers']:
-                        reconstructed_drivers.append(ScoreDriver(
-                            factor=driver_dict['factor'],
-                            impact=driver_dict['impact'],
-                            score_delta=driver_dict['score_delta'],
-                            explanation=driver_dict['explanation'],
-                            source=driver_dict['source']
-                        ))
-                    score_dict['drivers'] = reconstructed_drivers
-                
-                health_score = HealthScore(**score_dict)
-                return product_data, health_score
-        
-        return None
-    
-    def search_products(self, query: str) -> List[Tuple[str, str, str]]:
-        """Search products by name"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT DISTINCT name, brand, barcode FROM products 
-                WHERE name LIKE ? OR brand LIKE ?
-                ORDER BY updated_at DESC LIMIT 20
-            """, (f"%{query}%", f"%{query}%"))
-            
-            return cursor.fetchall()
-    
-    def get_recent_products(self, limit: int = 20) -> List[Tuple[str, str, str, str]]:
-        """Get recently analyzed products"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT name, brand, barcode, updated_at FROM products 
-                ORDER BY updated_at DESC LIMIT ?
-            """, (limit,))
-            
-            return cursor.fetchall()
-
-# Streamlit UI
 def main():
     st.set_page_config(
         page_title="Food Health Rating App",
@@ -553,20 +102,17 @@ def main():
         layout="wide"
     )
     
+    init_metrics()
+    
     st.title("🥗 Food Health Rating App")
     st.markdown("*Transparent, evidence-based health scores for packaged foods*")
     
-    # Initialize components
-    if 'db' not in st.session_state:
-        st.session_state.db = ProductDatabase()
-    if 'scorer' not in st.session_state:
-        st.session_state.scorer = HealthScorer()
-    
     # Sidebar navigation
     st.sidebar.title("Navigation")
     page = st.sidebar.selectbox("Choose a page", [
         "Analyze Product", 
         "Browse History", 
+        "Diagnostics",
         "About & Sources"
     ])
     
@@ -574,6 +120,8 @@ def main():
         analyze_product_page()
     elif page == "Browse History":
         browse_history_page()
+    elif page == "Diagnostics":
+        diagnostics_page()
     else:
         about_page()
 
@@ -599,6 +147,27 @@ def analyze_product_page():
 
     if product_data:
         display_analysis(product_data)
+def run_ocr(image_bytes: bytes) -> str:
+    """OCR an uploaded image in the background pool, showing progress while it runs
+    
+    Reruns with the same image are served from the service's cache.
+    """
+    service = get_ocr_service()
+    text = service.cached_text(image_bytes)
+    if text is not None:
+        return text
+    
+    future = service.submit(image_bytes)
+    expected = service.average_seconds() or 5.0
+    progress = st.progress(0.0, text="Running OCR...")
+    start = time.monotonic()
+    while not future.done():
+        elapsed = time.monotonic() - start
+        progress.progress(min(0.95, elapsed / expected), text=f"Running OCR... {elapsed:.1f}s")
+        time.sleep(0.2)
+    progress.empty()
+    return future.result()
+
 # OCR/photo upload form for extracting ingredients and nutrition
 def photo_upload_form() -> Optional[ProductData]:
     st.subheader("Upload Product Label Photo (OCR)")
@@ -606,12 +175,11 @@ def photo_upload_form() -> Optional[ProductData]:
     ocr_text = ""
     if uploaded_file:
         try:
-            import pytesseract
-            from PIL import Image
-            pytesseract.pytesseract.tesseract_cmd = r'C:\Users\siriu\Downloads\tesseract-ocr-w64-setup-5.5.0.20241111.exe'
-            image = Image.open(uploaded_file)
-            ocr_text = pytesseract.image_to_string(image)
+            ocr_text = run_ocr(uploaded_file.getvalue())
             st.text_area("Extracted Text (OCR)", ocr_text, height=200)
+        except OCRBusyError:
+            st.warning("OCR is busy with other images. Please try again in a moment.")
+            return None
         except Exception as e:
             st.error(f"OCR failed: {e}")
             return None
@@ -619,50 +187,19 @@ def photo_upload_form() -> Optional[ProductData]:
         st.info("Upload a product label image to extract text.")
         return None
 
-    # Simple parsing for ingredients and nutrition facts
-    ingredients = ""
-    nutrients = {}
-    serving_size = 100.0
-    name = ""
-    brand = ""
-    barcode = ""
+    # Extract ingredients, nutrition facts and product details in one pass
+    fields = parse_label_text(ocr_text)
+    ingredients = fields.ingredients
+    nutrients = fields.nutrients
+    serving_size = fields.serving_size or 100.0
+    name = fields.name
+    brand = fields.brand
+    barcode = fields.barcode
     categories = []
 
-    # Try to extract ingredients
-    match = re.search(r"ingredients[:]?(.+)", ocr_text, re.IGNORECASE)
-    if match:
-        ingredients = match.group(1).split("Nutrition")[0].strip()
-    else:
+    if not ingredients:
         st.warning("Ingredients not found in OCR text. Please add manually.")
 
-    # Try to extract nutrition facts
-    nutrition_matches = re.findall(r"([A-Za-z ]+):?\s*(\d+\.?\d*)\s*(g|mg|kcal|cal)?", ocr_text)
-    for n in nutrition_matches:
-        key = n[0].strip()
-        value = n[1]
-        unit = n[2] if n[2] else "g"
-        nutrients[key] = f"{value}{unit}"
-
-    # Try to extract serving size
-    serving_match = re.search(r"serving size[:]?\s*(\d+\.?\d*)\s*g", ocr_text, re.IGNORECASE)
-    if serving_match:
-        serving_size = float(serving_match.group(1))
-
-    # Try to extract product name
-    name_match = re.search(r"product name[:]?\s*([A-Za-z0-9 \-]+)", ocr_text, re.IGNORECASE)
-    if name_match:
-        name = name_match.group(1).strip()
-
-    # Try to extract brand
-    brand_match = re.search(r"brand[:]?\s*([A-Za-z0-9 \-]+)", ocr_text, re.IGNORECASE)
-    if brand_match:
-        brand = brand_match.group(1).strip()
-
-    # Try to extract barcode
-    barcode_match = re.search(r"barcode[:]?\s*(\d{8,14})", ocr_text, re.IGNORECASE)
-    if barcode_match:
-        barcode = barcode_match.group(1)
-
     # Normalize data
     normalized_ingredients = IngredientNormalizer.normalize_ingredient_list(ingredients)
     normalized_nutrients = NutrientNormalizer.normalize_nutrients(nutrients, serving_size)
@@ -810,64 +347,22 @@ def barcode_lookup_form() -> Optional[ProductData]:
     barcode = st.text_input("Enter Barcode", help="UPC or EAN barcode")
     if barcode and st.button("Search Database"):
         # First check our local database
-        result = st.session_state.db.get_product_by_barcode(barcode)
+        result = get_database().get_product_by_barcode(barcode)
         if result:
             st.success("Found in local database!")
             return result[0]
         else:
             st.info("Barcode not found in local database. Searching Open Food Facts...")
-            # Query Open Food Facts API
             try:
-                api_url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
-                resp = requests.get(api_url, timeout=10)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    if data.get("status") == 1:
-                        product = data["product"]
-                        name = product.get("product_name", "")
-                        brand = product.get("brands", "")
-                        ingredients_text = product.get("ingredients_text", "")
-                        serving_size = 100.0
-                        if product.get("serving_size"):
-                            match = re.search(r"(\d+\.?\d*)\s*g", product["serving_size"])
-                            if match:
-                                serving_size = float(match.group(1))
-                        # Nutrition facts
-                        nutriments = product.get("nutriments", {})
-                        raw_nutrients = {}
-                        if "energy-kcal_100g" in nutriments:
-                            raw_nutrients["calories"] = f"{nutriments['energy-kcal_100g']}kcal"
-                        if "fat_100g" in nutriments:
-                            raw_nutrients["total_fat"] = f"{nutriments['fat_100g']}g"
-                        if "saturated-fat_100g" in nutriments:
-                            raw_nutrients["saturated_fat"] = f"{nutriments['saturated-fat_100g']}g"
-                        if "sodium_100g" in nutriments:
-                            raw_nutrients["sodium"] = f"{nutriments['sodium_100g']}mg"
-                        if "carbohydrates_100g" in nutriments:
-                            raw_nutrients["total_carbohydrates"] = f"{nutriments['carbohydrates_100g']}g"
-                        if "fiber_100g" in nutriments:
-                            raw_nutrients["dietary_fiber"] = f"{nutriments['fiber_100g']}g"
-                        if "sugars_100g" in nutriments:
-                            raw_nutrients["total_sugars"] = f"{nutriments['sugars_100g']}g"
-                        if "proteins_100g" in nutriments:
-                            raw_nutrients["protein"] = f"{nutriments['proteins_100g']}g"
-                        normalized_ingredients = IngredientNormalizer.normalize_ingredient_list(ingredients_text)
-                        normalized_nutrients = NutrientNormalizer.normalize_nutrients(raw_nutrients, serving_size)
-                        product_data = ProductData(
-                            barcode=barcode,
-                            name=name,
-                            brand=brand,
-                            ingredients=normalized_ingredients,
-                            nutrients=normalized_nutrients,
-                            serving_size_g=serving_size,
-                            categories=[]
-                        )
-                        st.success("Product found via Open Food Facts!")
-                        return product_data
-                    else:
-                        st.warning("Product not found in Open Food Facts. Please use manual entry.")
-                else:
-                    st.error(f"Open Food Facts API error: {resp.status_code}")
+                off_product = get_off_client().get_product(barcode)
+                if off_product is not None:
+                    st.success("Product found via Open Food Facts!")
+                    return product_from_open_food_facts(barcode, off_product)
+                st.warning("Product not found in Open Food Facts. Please use manual entry.")
+            except ValueError as e:
+                st.error(str(e))
+            except requests.HTTPError as e:
+                st.error(f"Open Food Facts API error: {e.response.status_code}")
             except Exception as e:
                 st.error(f"Error connecting to Open Food Facts: {e}")
     return None
@@ -878,7 +373,7 @@ def search_database_form() -> Optional[ProductData]:
     query = st.text_input("Search by product name or brand")
     
     if query and len(query) >= 2:
-        results = st.session_state.db.search_products(query)
+        results = search_products_cached(query)
         
         if results:
             st.write(f"Found {len(results)} product(s):")
@@ -892,7 +387,7 @@ def search_database_form() -> Optional[ProductData]:
                     st.write(f"*{brand or 'Unknown brand'}*")
                 with col3:
                     if st.button("Select", key=f"select_{i}"):
-                        result = st.session_state.db.get_product_by_barcode(barcode)
+                        result = get_database().get_product_by_barcode(barcode)
                         if result:
                             return result[0]
         else:
@@ -904,11 +399,10 @@ def display_analysis(product: ProductData):
     """Display the complete product analysis"""
     st.header("Product Analysis")
     
-    # Generate score
-    score = st.session_state.scorer.score_product(product)
-    
-    # Save to database
-    st.session_state.db.save_product(product, score)
+    # Classify, score and queue the save through the same pipeline as batch jobs;
+    # unchanged products are skipped by the database
+    job = get_pipeline().process(ProductJob(product=product))
+    score = job.score
     
     # Display score prominently
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -1006,7 +500,7 @@ def display_analysis(product: ProductData):
     # Ingredients analysis
     if product.ingredients:
         with st.expander("🧪 Ingredients Analysis"):
-            classification = IngredientNormalizer.classify_ingredients(product.ingredients)
+            classification = job.classification
             
             if classification['beneficial_ingredients']:
                 st.write("**✅ Beneficial Ingredients:**")
@@ -1028,23 +522,24 @@ def browse_history_page():
     st.header("Browse Analysis History")
     
     # Recent products
-    recent = st.session_state.db.get_recent_products(50)
+    col1, col2 = st.columns(2)
+    with col1:
+        band_filter = st.multiselect("Filter by grade", ["A", "B", "C", "D", "E"])
+    with col2:
+        confidence_filter = st.multiselect("Filter by confidence", ["high", "medium", "low"])
+    recent = load_recent_products(50, band_filter, confidence_filter)
     
     if recent:
         st.subheader("Recent Analyses")
         
         # Create dataframe for display
         df_data = []
-        for name, brand, barcode, updated_at in recent:
-            # Get the score for display
-            result = st.session_state.db.get_product_by_barcode(barcode) if barcode else None
-            score_band = result[1].band if result else "N/A"
-            score_value = result[1].overall_score if result else "N/A"
-            
+        for name, brand, barcode, updated_at, score_value, score_band, confidence in recent:
             df_data.append({
                 'Product': name,
                 'Brand': brand or 'Unknown',
-                'Score': f"{score_value} ({score_band})" if result else "N/A",
+                'Score': f"{score_value} ({score_band})" if score_value is not None else "N/A",
+                'Confidence': confidence.title() if confidence else "N/A",
                 'Last Updated': updated_at[:10],  # Just the date
                 'Barcode': barcode or 'N/A'
             })
@@ -1065,7 +560,7 @@ def browse_history_page():
             selected_barcode = recent[selected_idx][2]
             
             if selected_barcode:
-                result = st.session_state.db.get_product_by_barcode(selected_barcode)
+                result = get_database().get_product_by_barcode(selected_barcode)
                 if result:
                     st.markdown("---")
                     display_analysis(result[0])
@@ -1077,7 +572,7 @@ def browse_history_page():
     search_query = st.text_input("Search your analyzed products")
     
     if search_query:
-        results = st.session_state.db.search_products(search_query)
+        results = search_products_cached(search_query)
         
         if results:
             for name, brand, barcode in results:
@@ -1089,11 +584,54 @@ def browse_history_page():
                     st.write(f"*{brand or 'Unknown brand'}*")
                 with col3:
                     if st.button("View", key=f"view_{barcode}"):
-                        result = st.session_state.db.get_product_by_barcode(barcode)
+                        result = get_database().get_product_by_barcode(barcode)
                         if result:
                             st.markdown("---")
                             display_analysis(result[0])
 
+def diagnostics_page():
+    st.header("Diagnostics")
+    
+    enabled = st.toggle("Collect metrics", value=METRICS.enabled,
+                        help="When off, instrumented functions only check this flag")
+    METRICS.enabled = enabled
+    
+    col1, col2 = st.columns([1, 5])
+    with col1:
+        if st.button("Reset metrics"):
+            METRICS.reset()
+    with col2:
+        st.download_button("Download metrics.txt", METRICS.render_text(), file_name="metrics.txt", mime="text/plain")
+    
+    # Times are inclusive: score_product includes the _score_* calls it makes
+    st.subheader("Function latency")
+    summary = METRICS.function_summary()
+    if summary:
+        df = pd.DataFrame(summary).rename(columns={
+            'function': 'Function', 'calls': 'Calls', 'errors': 'Errors', 'total_seconds': 'Total (s)',
+            'mean_ms': 'Mean (ms)', 'p50_ms': 'p50 ≤ (ms)', 'p95_ms': 'p95 ≤ (ms)', 'p99_ms': 'p99 ≤ (ms)'
+        })
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    elif enabled:
+        st.info("No instrumented calls recorded yet. Analyze a product to collect some.")
+    else:
+        st.info("Metrics collection is off.")
+    
+    st.subheader("Pipeline stages")
+    st.dataframe(pd.DataFrame(get_pipeline().stats()), use_container_width=True, hide_index=True)
+    
+    st.subheader("Caches")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Score cache**")
+        st.json(get_scorer().cache_stats())
+    with col2:
+        st.markdown("**Barcode lookup cache**")
+        st.json(get_database().cache_stats())
+    
+    with st.expander("Text exposition format"):
+        st.code(METRICS.render_text(), language="text")
+
 def about_page():
     st.header("About This App")
     
@@ -1194,10 +732,10 @@ def about_page():
     st.subheader("📊 Usage Statistics")
     
     # Show some basic stats from the database
-    with sqlite3.connect(st.session_state.db.db_path) as conn:
-        total_products = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
-        unique_brands = conn.execute("SELECT COUNT(DISTINCT brand) FROM products WHERE brand IS NOT NULL").fetchone()[0]
-        avg_score = conn.execute("SELECT AVG(CAST(json_extract(health_score, '$.overall_score') AS FLOAT)) FROM products").fetchone()[0]
+    stats = load_stats()
+    total_products = stats['total_products']
+    unique_brands = stats['unique_brands']
+    avg_score = stats['average_score']
     
     col1, col2, col3 = st.columns(3)
     
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Bulk barcode resolver
+
+Resolves many barcodes to ProductData: the local ProductDatabase is checked
+first, and misses are fetched from Open Food Facts concurrently with a bounded
+number of in-flight requests. Lookups for the same barcode that are already in
+flight (duplicates in the input or calls from other threads) share one fetch.
+"""
+
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional
+
+from core import (
+    HealthScorer, ProductData, ProductDatabase, load_config, product_from_open_food_facts
+)
+from logging_config import configure_logging
+from openfoodfacts_client import OpenFoodFactsClient
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ResolvedProduct:
+    barcode: str
+    product: Optional[ProductData]
+    source: str  # "database", "openfoodfacts", "not_found" or "error"
+    error: Optional[str] = None
+
+class BulkBarcodeResolver:
+    """Resolve barcodes from the local database, then Open Food Facts"""
+
+    def __init__(self, db: ProductDatabase, client: OpenFoodFactsClient, max_concurrency: int = 8):
+        self.db = db
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="off-fetch")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.coalesced = 0
+
+    def resolve(self, barcodes: Iterable[str]) -> Iterator[ResolvedProduct]:
+        """Yield one result per input barcode, in completion order
+
+        ``barcodes`` is consumed lazily and at most twice ``max_concurrency``
+        fetches are pending at once, so arbitrarily long inputs use bounded memory.
+        """
+        max_pending = self.max_concurrency * 2
+        pending: Dict[Future, list] = {}
+
+        for barcode in barcodes:
+            barcode = barcode.strip()
+            if not barcode:
+                continue
+
+            local = self.db.get_product_by_barcode(barcode)
+            if local:
+                yield ResolvedProduct(barcode, local[0], "database")
+                continue
+
+            pending.setdefault(self._fetch(barcode), []).append(barcode)
+            while len(pending) >= max_pending:
+                yield from self._drain(pending, FIRST_COMPLETED)
+
+        while pending:
+            yield from self._drain(pending, FIRST_COMPLETED)
+
+    def resolve_one(self, barcode: str) -> ResolvedProduct:
+        return next(self.resolve([barcode]))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _fetch(self, barcode: str) -> Future:
+        """Return the in-flight fetch for a barcode, starting one if needed"""
+        with self._lock:
+            future = self._inflight.get(barcode)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._executor.submit(self._lookup, barcode)
+            self._inflight[barcode] = future
+            self.fetches += 1
+        # Registered outside the lock: the callback runs inline if already done
+        future.add_done_callback(lambda f, b=barcode: self._forget(b, f))
+        return future
+
+    def _forget(self, barcode: str, future: Future):
+        with self._lock:
+            if self._inflight.get(barcode) is future:
+                del self._inflight[barcode]
+
+    def _lookup(self, barcode: str) -> ResolvedProduct:
+        try:
+            off_product = self.client.get_product(barcode)
+        except Exception as e:
+            logger.warning(f"Open Food Facts lookup failed for {barcode}: {e}")
+            return ResolvedProduct(barcode, None, "error", str(e))
+
+        if off_product is None:
+            return ResolvedProduct(barcode, None, "not_found")
+        return ResolvedProduct(barcode, product_from_open_food_facts(barcode, off_product), "openfoodfacts")
+
+    @staticmethod
+    def _drain(pending: Dict[Future, list], return_when) -> Iterator[ResolvedProduct]:
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            result = future.result()
+            for barcode in pending.pop(future):
+                yield ResolvedProduct(barcode, result.product, result.source, result.error)
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve a file of barcodes (one per line)")
+    parser.add_argument("barcodes_file")
+    parser.add_argument("--concurrency", type=int, help="Maximum concurrent Open Food Facts requests")
+    parser.add_argument("--save", action="store_true", help="Score fetched products and store them in the database")
+    args = parser.parse_args()
+
+    config = load_config()
+    configure_logging(config.get("logging", {}))
+    off_settings = config.get("openfoodfacts") or {}
+    concurrency = args.concurrency or off_settings.get("max_concurrency", 8)
+
+    db = ProductDatabase()
+    client = OpenFoodFactsClient.from_config(off_settings)
+    resolver = BulkBarcodeResolver(db, client, concurrency)
+
+    counts: Dict[str, int] = {}
+    fetched = []
+    start = time.perf_counter()
+    with open(args.barcodes_file, encoding="utf-8") as f:
+        for result in resolver.resolve(f):
+            counts[result.source] = counts.get(result.source, 0) + 1
+            if args.save and result.source == "openfoodfacts":
+                fetched.append(result.product)
+    elapsed = time.perf_counter() - start
+
+    if fetched:
+        db.save_products(zip(fetched, HealthScorer().score_batch(fetched)))
+
+    resolver.close()
+    client.close()
+    db.close()
+
+    total = sum(counts.values())
+    print(f"Resolved {total} barcodes in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f}/s)")
+    for source, count in sorted(counts.items()):
+        print(f"  {source}: {count}")
+    print(f"  HTTP fetches: {resolver.fetches}, coalesced duplicates: {resolver.coalesced}")
+
+if __name__ == "__main__":
+    main()
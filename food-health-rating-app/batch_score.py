@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Batch scoring CLI
+
+Scores products from a CSV or JSONL file across a pool of worker processes
+and writes the results to a JSONL file and/or the product database.
+
+JSONL lines hold one product each: barcode, name, brand, ingredients (raw
+text or a normalized list), serving_size_g, categories and nutrients (raw
+strings such as "12g", or NutrientInfo dicts as in ProductData). CSV files
+use the same field names as columns, with categories separated by ";" and
+every other column read as a raw nutrient.
+
+    python batch_score.py products.jsonl --output scores.jsonl --workers 4 --chunk-size 500
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core import (
+    HealthScore, HealthScorer, ProductData, ProductDatabase, ProductJob, build_product_pipeline,
+    load_config
+)
+from logging_config import configure_logging
+from off_importer import detect_format, open_dump
+from pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+CSV_PRODUCT_COLUMNS = {"barcode", "name", "brand", "ingredients", "serving_size_g", "categories"}
+
+# One pipeline per worker process, created on first use
+_pipeline: Optional[Pipeline] = None
+
+def iter_jsonl(f) -> Iterator[Optional[Dict]]:
+    """Yield each product; None for lines that are not a JSON object"""
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield record if isinstance(record, dict) else None
+
+def iter_csv(f) -> Iterator[Dict]:
+    csv.field_size_limit(sys.maxsize)
+    for row in csv.DictReader(f):
+        record = {key: row[key] for key in CSV_PRODUCT_COLUMNS if row.get(key)}
+        if "categories" in record:
+            record["categories"] = [c.strip() for c in record["categories"].split(";") if c.strip()]
+        record["nutrients"] = {
+            key: value for key, value in row.items() if key not in CSV_PRODUCT_COLUMNS and value
+        }
+        yield record
+
+def score_chunk(records: List[Dict]) -> List[Tuple[ProductData, HealthScore]]:
+    """Worker entry point: run one chunk of records through the product pipeline
+
+    Records that cannot be normalized are dropped, so fewer pairs may come back.
+    """
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = build_product_pipeline(HealthScorer(), batch_size=len(records))
+    jobs = _pipeline.process_many(ProductJob(record=record) for record in records)
+    return [(job.product, job.score) for job in jobs]
+
+def _chunks(records: Iterable[Dict], chunk_size: int) -> Iterator[List[Dict]]:
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def score_records(records: Iterable[Dict], workers: int, chunk_size: int, ordered: bool = True,
+                  pipeline: Optional[Pipeline] = None,
+                  threaded: bool = False) -> Iterator[List[Tuple[ProductData, HealthScore]]]:
+    """Yield scored chunks, keeping at most two chunks per worker in flight
+
+    With ``ordered`` chunks come back in input order; otherwise each chunk is
+    yielded as soon as it completes. With fewer than two workers a pool only
+    adds pickling overhead, so chunks go through the product pipeline in this
+    process instead; ``threaded`` overlaps the stages on threads, which helps
+    only when a stage spends its time blocked on I/O.
+    """
+    if workers < 2:
+        pipeline = pipeline or build_product_pipeline(HealthScorer(), batch_size=chunk_size)
+        if threaded:
+            jobs = pipeline.run(ProductJob(record=record) for record in records)
+            for chunk in _chunks(jobs, chunk_size):
+                yield [(job.product, job.score) for job in chunk]
+            return
+        for chunk in _chunks(records, chunk_size):
+            jobs = pipeline.process_many(ProductJob(record=record) for record in chunk)
+            yield [(job.product, job.score) for job in jobs]
+        return
+
+    chunks = _chunks(records, chunk_size)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for chunk in chunks:
+            pending.append(executor.submit(score_chunk, chunk))
+            while len(pending) >= workers * 2:
+                yield from _collect(pending, ordered)
+        while pending:
+            yield from _collect(pending, ordered)
+
+def _collect(pending: list, ordered: bool) -> Iterator[List[Tuple[ProductData, HealthScore]]]:
+    if ordered:
+        yield pending.pop(0).result()
+        return
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.remove(future)
+        yield future.result()
+
+def print_stage_stats(pipeline: Pipeline):
+    for stats in pipeline.stats():
+        print(f"  {stats['stage']:<10} {stats['items']:>9,} items  {stats['busy_seconds']:7.2f}s busy  "
+              f"{stats['input_wait_seconds']:7.2f}s starved  {stats['output_wait_seconds']:7.2f}s blocked")
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV or JSONL file of products")
+    parser.add_argument("input", help="Products file (.csv or .jsonl, optionally .gz)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Override format detection")
+    parser.add_argument("--output", help="Write {product, score} JSONL here")
+    parser.add_argument("--db", nargs="?", const="", help="Also save to the database (path defaults to config.yaml)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes; 0 or 1 scores in-process")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Records sent to a worker at a time")
+    parser.add_argument("--unordered", action="store_true", help="Emit chunks as they finish instead of in input order")
+    parser.add_argument("--threaded", action="store_true", help="Overlap pipeline stages on threads (in-process only)")
+    parser.add_argument("--verbose", action="store_true", help="Log every product (DEBUG) as well as batch progress")
+    args = parser.parse_args()
+
+    if args.output is None and args.db is None:
+        parser.error("nothing to do: pass --output and/or --db")
+    configure_logging(load_config().get("logging", {}))
+    # Per-product normalization logs would dominate batch runs, unless asked for
+    logging.getLogger("core").setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+
+    fmt = args.format or detect_format(args.input)
+    db = ProductDatabase(args.db or None) if args.db is not None else None
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+
+    # In-process runs persist through the pipeline and report per-stage timings
+    pipeline = build_product_pipeline(HealthScorer(), db, batch_size=args.chunk_size) if args.workers < 2 else None
+
+    read = 0
+    def usable(records: Iterable[Optional[Dict]]) -> Iterator[Dict]:
+        nonlocal read
+        for record in records:
+            read += 1
+            if record is not None:
+                yield record
+
+    count = 0
+    start = time.perf_counter()
+    try:
+        with open_dump(args.input) as f:
+            records = usable(iter_jsonl(f) if fmt == "jsonl" else iter_csv(f))
+            for scored in score_records(records, args.workers, args.chunk_size, not args.unordered,
+                                        pipeline, args.threaded):
+                if out:
+                    for product, score in scored:
+                        out.write(json.dumps({"product": product.to_dict(), "score": score.to_dict()}) + "\n")
+                if db and not pipeline:
+                    db.save_products(scored)
+                count += len(scored)
+                elapsed = time.perf_counter() - start
+                print(f"\r{count:,} products scored ({count / elapsed:,.0f}/s)", end="", flush=True)
+    finally:
+        if out:
+            out.close()
+        if db:
+            db.close()
+
+    elapsed = time.perf_counter() - start
+    # Unparsable lines and records the normalize stage dropped
+    print(f"\nScored {count:,} products ({read - count:,} skipped) in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} products/s) "
+          f"with {args.workers} workers, chunk size {args.chunk_size}")
+    if pipeline:
+        print_stage_stats(pipeline)
+
+if __name__ == "__main__":
+    main()
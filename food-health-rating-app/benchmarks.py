@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Hot-path benchmark suite
+
+Times the functions every product passes through, at several scale tiers:
+the ingredient and nutrient normalizers, ingredient classification,
+HealthScorer.score_product, and the ProductDatabase save, barcode lookup and
+search paths. Each tier streams that many products from the seeded corpus
+generator, so memory stays flat even at a million.
+
+Every call is timed on its own; results hold throughput and latency
+percentiles per benchmark and tier, plus enough about the machine and
+checkout to compare runs over time. The database benchmarks save every
+product of the tier with save_product into a fresh database, then look up
+and search a fixed number of them; lookups use distinct barcodes, so they
+measure the SQLite path rather than the lookup cache.
+
+    python benchmarks.py --tiers 1000 100000 1000000 --output benchmarks.json
+    python benchmarks.py --tiers 1000 --compare benchmarks.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from core import (
+    HealthScorer, IngredientNormalizer, NutrientNormalizer, ProductDatabase, load_config, product_from_record
+)
+from corpus_generator import CATEGORY_PROFILES, ean13, generate_records
+from logging_config import configure_logging
+from metrics import METRICS
+
+DEFAULT_TIERS = [1000, 100000, 1000000]
+
+BENCHMARKS = [
+    "normalize_ingredient_list", "classify_ingredients", "normalize_nutrients", "score_product",
+    "save_product", "get_product_by_barcode", "search_products"
+]
+
+def time_calls(fn: Callable, calls: Iterable[Tuple]) -> array:
+    """Call ``fn(*args)`` for each argument tuple, returning each call's duration in ns"""
+    durations = array("q")
+    clock = time.perf_counter_ns
+    for args in calls:
+        start = clock()
+        fn(*args)
+        durations.append(clock() - start)
+    return durations
+
+def summarize(durations: array) -> Dict[str, float]:
+    if not durations:
+        return {"calls": 0}
+    values = np.frombuffer(durations, dtype=np.int64) / 1000.0
+    total_seconds = float(values.sum()) / 1e6
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "calls": len(values),
+        "total_seconds": total_seconds,
+        "ops_per_second": len(values) / total_seconds if total_seconds else 0.0,
+        "mean_us": float(values.mean()),
+        "p50_us": float(p50),
+        "p95_us": float(p95),
+        "p99_us": float(p99),
+        "max_us": float(values.max())
+    }
+
+def run_tier(tier: int, seed: int, selected: List[str], workdir: str, lookups: int, searches: int) -> Dict[str, Dict]:
+    """Run the selected benchmarks over ``tier`` products"""
+    results = {}
+    records = lambda: generate_records(tier, seed)
+
+    def run(name: str, fn: Callable, calls: Callable[[], Iterable[Tuple]]):
+        if name in selected:
+            print(f"  {name} ...", end="", flush=True, file=sys.stderr)
+            results[name] = summarize(time_calls(fn, calls()))
+            print(f" {results[name]['ops_per_second']:,.0f} ops/s", file=sys.stderr)
+
+    run("normalize_ingredient_list", IngredientNormalizer.normalize_ingredient_list,
+        lambda: ((record["ingredients"],) for record in records()))
+    run("classify_ingredients", IngredientNormalizer.classify_ingredients,
+        lambda: ((IngredientNormalizer.normalize_ingredient_list(record["ingredients"]),) for record in records()))
+    run("normalize_nutrients", NutrientNormalizer.normalize_nutrients,
+        lambda: ((record["nutrients"], record["serving_size_g"]) for record in records()))
+
+    scorer = HealthScorer()
+    products = lambda: (product_from_record(record) for record in records())
+    run("score_product", scorer.score_product, lambda: ((product,) for product in products()))
+
+    database_benchmarks = {"save_product", "get_product_by_barcode", "search_products"}
+    if not database_benchmarks & set(selected):
+        return results
+
+    db_path = os.path.join(workdir, f"benchmark-{tier}.db")
+    db = ProductDatabase(db_path)
+    try:
+        # Lookups and searches need the tier's products stored, whether or not saving is timed
+        scored = lambda: ((product, scorer.score_product(product)) for product in products())
+        if "save_product" in selected:
+            run("save_product", db.save_product, scored)
+        else:
+            db.save_products(scored())
+
+        rng = random.Random(seed + tier)
+        barcodes = [ean13(index) for index in rng.sample(range(tier), min(lookups, tier))]
+        run("get_product_by_barcode", db.get_product_by_barcode, lambda: ((barcode,) for barcode in barcodes))
+        if "get_product_by_barcode" in results:
+            results["get_product_by_barcode"]["cache"] = db.cache_stats()
+
+        terms = sorted({
+            word
+            for profile in CATEGORY_PROFILES.values()
+            for phrase in profile.adjectives + profile.nouns + profile.brands
+            for word in re.findall(r"[a-z]{2,}", phrase.lower())
+        })
+        queries = [
+            " ".join(rng.sample(terms, rng.randint(1, 2))) if rng.random() < 0.8 else rng.choice(terms)[:3]
+            for _ in range(searches)
+        ]
+        run("search_products", db.search_products, lambda: ((query,) for query in queries))
+        if "search_products" in results:
+            results["search_products"]["fts"] = db.fts_enabled
+    finally:
+        db.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return results
+
+def environment() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "rule_version": HealthScorer().current_rules().version
+    }
+
+def compare(results: Dict, baseline: Dict):
+    """Print the throughput change of every benchmark present in both runs"""
+    print(f"{'benchmark':<28} {'tier':>9} {'baseline ops/s':>15} {'ops/s':>12} {'change':>8}", file=sys.stderr)
+    for tier, benchmarks in results["tiers"].items():
+        for name, stats in benchmarks.items():
+            before = baseline.get("tiers", {}).get(tier, {}).get(name)
+            if not before or not before.get("ops_per_second") or not stats.get("ops_per_second"):
+                continue
+            change = stats["ops_per_second"] / before["ops_per_second"] - 1
+            print(f"{name:<28} {int(tier):>9,} {before['ops_per_second']:>15,.0f} "
+                  f"{stats['ops_per_second']:>12,.0f} {change:>+8.1%}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the normalize, classify, score and database hot paths")
+    parser.add_argument("--tiers", type=int, nargs="+", default=DEFAULT_TIERS, help="Products per tier")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Run only these benchmarks")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic products")
+    parser.add_argument("--lookups", type=int, default=10000, help="Barcode lookups per tier")
+    parser.add_argument("--searches", type=int, default=1000, help="Searches per tier")
+    parser.add_argument("--workdir", help="Directory for the benchmark databases (default: a temporary one)")
+    parser.add_argument("--output", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="Earlier JSON results to compare throughput against")
+    parser.add_argument("--metrics", action="store_true", help="Enable the metrics registry, to measure its overhead")
+    parser.add_argument("--verbose", action="store_true", help="Log every product (DEBUG) as well as batch progress")
+    args = parser.parse_args()
+
+    configure_logging(load_config().get("logging", {}))
+    # Per-product logs would be timed along with the code under test, unless asked for
+    logging.getLogger("core").setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    METRICS.enabled = args.metrics
+
+    selected = args.only or BENCHMARKS
+    workdir = args.workdir or tempfile.mkdtemp(prefix="food-benchmarks-")
+    results = {"environment": environment(), "seed": args.seed, "metrics_enabled": args.metrics, "tiers": {}}
+    try:
+        for tier in args.tiers:
+            print(f"Tier {tier:,}", file=sys.stderr)
+            results["tiers"][str(tier)] = run_tier(tier, args.seed, selected, workdir, args.lookups, args.searches)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
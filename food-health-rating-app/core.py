@@ -0,0 +1,1812 @@
+# Food Health Rating App - core
+# Products, normalizers, scoring rules, the scorer, the product database and
+# the product pipeline, without the Streamlit UI.
+#
+# Importing this module has no side effects: it configures no logging and
+# creates no files. NumPy, pandas and PyYAML are imported on first use, so
+# CLI tools and batch workers that only score products start quickly.
+
+import json
+import sqlite3
+import hashlib
+import datetime
+import math
+import time
+import re
+import logging
+from dataclasses import dataclass, asdict, field, replace
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import io
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import METRICS
+from pipeline import Pipeline, Stage
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Distinguishes "not cached" from a cached None
+_MISSING = object()
+
+def _content_hash(data: Dict) -> str:
+    """Canonical hash of a serialized dataclass, independent of key order"""
+    return hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+CONFIG_PATH = Path(__file__).with_name("config.yaml")
+
+def load_config(path: Path = CONFIG_PATH) -> Dict:
+    """Load config.yaml, returning an empty config if it is missing or invalid"""
+    import yaml
+    
+    try:
+        with open(path, encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        logger.warning(f"Could not load config from {path}: {e}")
+        return {}
+
+@dataclass
+class NutrientInfo:
+    """Standardized nutrient information"""
+    name: str
+    value: float
+    unit: str
+    per_100g: float  # normalized to 100g for comparison
+
+@dataclass
+class ProductData:
+    """Normalized product information"""
+    barcode: Optional[str] = None
+    name: str = ""
+    brand: str = ""
+    ingredients: List[str] = None
+    nutrients: Dict[str, NutrientInfo] = None
+    serving_size_g: Optional[float] = None
+    categories: List[str] = None
+    
+    def __post_init__(self):
+        if self.ingredients is None:
+            self.ingredients = []
+        if self.nutrients is None:
+            self.nutrients = {}
+        if self.categories is None:
+            self.categories = []
+    
+    def to_dict(self) -> Dict:
+        """Fast equivalent of dataclasses.asdict for serialization hot paths"""
+        data = dict(vars(self))
+        data['ingredients'] = list(self.ingredients)
+        data['nutrients'] = {key: dict(vars(info)) for key, info in self.nutrients.items()}
+        data['categories'] = list(self.categories)
+        return data
+    
+    def content_hash(self) -> str:
+        """Hash of the product contents; stored as data_hash in the database"""
+        return _content_hash(self.to_dict())
+    
+    def content_key(self) -> Tuple:
+        """Hashable canonical snapshot of the contents, much cheaper than content_hash"""
+        return (
+            self.barcode,
+            self.name,
+            self.brand,
+            tuple(self.ingredients),
+            tuple(sorted(
+                (key, info.name, info.value, info.unit, info.per_100g)
+                for key, info in self.nutrients.items()
+            )),
+            self.serving_size_g,
+            tuple(self.categories)
+        )
+
+@dataclass
+class ScoreDriver:
+    """Individual scoring factor"""
+    factor: str
+    impact: str  # positive, negative, neutral
+    score_delta: float
+    explanation: str
+    source: str
+
+@dataclass
+class HealthScore:
+    """Complete health assessment"""
+    overall_score: int  # 0-100
+    band: str  # A, B, C, D, E
+    drivers: List[ScoreDriver]
+    evidence_sources: List[str]
+    confidence: str  # high, medium, low
+    warnings: List[str]
+    rule_version: Optional[str] = None  # RuleSet.version that produced it
+    
+    def to_dict(self) -> Dict:
+        """Fast equivalent of dataclasses.asdict for serialization hot paths"""
+        data = dict(vars(self))
+        data['drivers'] = [dict(vars(driver)) for driver in self.drivers]
+        data['evidence_sources'] = list(self.evidence_sources)
+        data['warnings'] = list(self.warnings)
+        return data
+
+@dataclass(frozen=True)
+class NutrientRule:
+    """Threshold rule applied to one nutrient's per-100g amount"""
+    nutrient: str
+    factor: str
+    impact: str  # positive, negative
+    threshold: float
+    rate: float
+    cap: float
+    explanation: str  # formatted with the measured amount
+    source: str
+    scale: float = 1  # converts per_100g into the unit the threshold is expressed in
+    excess_only: bool = False  # apply the rate only to the amount above the threshold
+    warning: Optional[str] = None
+
+    def applies(self, amount: float) -> bool:
+        if self.impact == "positive":
+            return amount >= self.threshold
+        return amount > self.threshold
+
+    def delta(self, amount: float) -> float:
+        base = amount - self.threshold if self.excess_only else amount
+        magnitude = min(self.cap, base * self.rate)
+        return magnitude if self.impact == "positive" else -magnitude
+
+@dataclass(frozen=True)
+class RuleSet:
+    """Immutable table of every scoring parameter, compiled from config.yaml
+    
+    ``version`` is a hash of the full table, so scores record exactly which
+    rules produced them and caches keyed on it never mix rule sets.
+    """
+    nutrient_rules: Tuple[NutrientRule, ...]
+    base_score: float = 50
+    min_score: int = 0
+    max_score: int = 100
+    harmful_additive_penalty: float = 5
+    harmful_additive_cap: float = 15
+    ultra_processed_penalty: float = 2
+    ultra_processed_threshold: int = 3
+    ultra_processed_cap: float = 8
+    beneficial_ingredient_bonus: float = 3
+    beneficial_ingredient_cap: float = 10
+    grade_bands: Tuple[Tuple[str, float], ...] = (("A", 80), ("B", 65), ("C", 50), ("D", 35), ("E", 0))
+    nutrients_weight: float = 50
+    ingredients_weight: float = 30
+    barcode_weight: float = 10
+    brand_weight: float = 10
+    confidence_high: float = 80
+    confidence_medium: float = 60
+    version: str = field(default="", compare=False)
+    
+    def __post_init__(self):
+        if not self.version:
+            params = asdict(self)
+            params.pop('version')
+            digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+            object.__setattr__(self, 'version', digest)
+    
+    def array(self, name: str) -> "np.ndarray":
+        """Column vector for the vectorized batch path, built on first use"""
+        arrays = self.__dict__.get('_arrays')
+        if arrays is None:
+            arrays = self._build_arrays()
+            object.__setattr__(self, '_arrays', arrays)
+        return arrays[name]
+    
+    def _build_arrays(self) -> Dict[str, "np.ndarray"]:
+        """Column vectors of the rule table, frozen like the rest of it"""
+        import numpy as np
+        
+        rules = self.nutrient_rules
+        arrays = {
+            'positive': np.array([rule.impact == "positive" for rule in rules], dtype=bool),
+            'thresholds': np.array([rule.threshold for rule in rules], dtype=float),
+            'rates': np.array([rule.rate for rule in rules], dtype=float),
+            'caps': np.array([rule.cap for rule in rules], dtype=float),
+            'scales': np.array([rule.scale for rule in rules], dtype=float),
+            'excess_only': np.array([rule.excess_only for rule in rules], dtype=bool),
+            # Bands ordered from lowest to highest minimum, for np.digitize
+            'band_labels': np.array([band for band, _ in reversed(self.grade_bands)]),
+            'band_edges': np.array([minimum for _, minimum in reversed(self.grade_bands)][1:], dtype=float)
+        }
+        for array in arrays.values():
+            array.setflags(write=False)
+        return arrays
+    
+    def band_for(self, score: float) -> str:
+        for band, minimum in self.grade_bands:
+            if score >= minimum:
+                return band
+        return self.grade_bands[-1][0]
+    
+    def confidence_for(self, points: float) -> str:
+        if points >= self.confidence_high:
+            return "high"
+        elif points >= self.confidence_medium:
+            return "medium"
+        return "low"
+
+class IngredientMatcher:
+    """Aho-Corasick automaton that finds the highest-priority category in one scan"""
+    
+    def __init__(self, pattern_groups: List[Tuple[str, Iterable[str]]]):
+        # Groups are given in priority order; a lower rank wins when several match
+        self.categories = [category for category, _ in pattern_groups]
+        self._no_match = len(self.categories)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[int] = [self._no_match]
+        
+        for rank, (_, patterns) in enumerate(pattern_groups):
+            for pattern in patterns:
+                self._add_pattern(pattern, rank)
+        self._build_failure_links()
+    
+    def _add_pattern(self, pattern: str, rank: int):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(self._no_match)
+                self._goto[node][char] = next_node
+            node = next_node
+        self._best[node] = min(self._best[node], rank)
+    
+    def _build_failure_links(self):
+        """Breadth-first pass so every node knows the best rank of all its suffixes"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._best[child] = min(self._best[child], self._best[self._fail[child]])
+                queue.append(child)
+    
+    def match(self, text: str) -> Optional[str]:
+        """Return the highest-priority category with a pattern occurring in text"""
+        goto, fail, best = self._goto, self._fail, self._best
+        node = 0
+        result = best[0]
+        for char in text:
+            if result == 0:
+                break
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if best[node] < result:
+                result = best[node]
+        return self.categories[result] if result < self._no_match else None
+
+class IngredientNormalizer:
+    """Normalize and classify ingredients using food science principles"""
+    
+    # Based on FDA and EFSA ingredient classification systems
+    HARMFUL_ADDITIVES = {
+        'sodium nitrite', 'sodium nitrate', 'potassium nitrite', 'potassium nitrate',
+        'bha', 'bht', 'tbhq', 'propyl gallate',
+        'artificial colors', 'red dye 40', 'yellow 6', 'blue 1',
+        'high fructose corn syrup', 'corn syrup solids'
+    }
+    
+    ULTRA_PROCESSED_MARKERS = {
+        'modified starch', 'hydrolyzed protein', 'isolated protein',
+        'artificial flavors', 'natural flavors', 'flavor enhancer',
+        'emulsifier', 'stabilizer', 'thickener'
+    }
+    
+    BENEFICIAL_INGREDIENTS = {
+        'whole grain', 'whole wheat', 'oats', 'quinoa', 'brown rice',
+        'fiber', 'protein', 'vitamins', 'minerals'
+    }
+    
+    # Built lazily from the three vocabularies above; reset to None after editing them
+    _matcher: Optional[IngredientMatcher] = None
+
+    @staticmethod
+    @METRICS.timed()
+    def normalize_ingredient_list(raw_ingredients: str) -> List[str]:
+        """Convert raw ingredient string to normalized list"""
+        if not raw_ingredients:
+            return []
+        
+        # Clean and split ingredients
+        ingredients = re.split(r'[,;]', raw_ingredients.lower())
+        normalized = []
+        
+        for ingredient in ingredients:
+            ingredient = ingredient.strip()
+            ingredient = re.sub(r'\([^)]*\)', '', ingredient)  # Remove parenthetical content
+            ingredient = re.sub(r'\s+', ' ', ingredient).strip()
+            if ingredient and len(ingredient) > 1:
+                normalized.append(ingredient)
+        
+        # Per-item messages stay at DEBUG, with lazy formatting, so the scoring loop never waits on a log write
+        logger.debug("Normalized %d ingredients from raw text", len(normalized))
+        return normalized
+
+    @staticmethod
+    def get_matcher() -> IngredientMatcher:
+        """Return the shared classification automaton, building it on first use"""
+        if IngredientNormalizer._matcher is None:
+            IngredientNormalizer._matcher = IngredientMatcher([
+                ('harmful_additives', IngredientNormalizer.HARMFUL_ADDITIVES),
+                ('ultra_processed_markers', IngredientNormalizer.ULTRA_PROCESSED_MARKERS),
+                ('beneficial_ingredients', IngredientNormalizer.BENEFICIAL_INGREDIENTS)
+            ])
+        return IngredientNormalizer._matcher
+
+    @staticmethod
+    @METRICS.timed()
+    def classify_ingredients(ingredients: List[str], cache: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, List[str]]:
+        """Classify ingredients into categories for scoring
+        
+        ``cache`` optionally maps lowercased ingredients to their category so
+        callers classifying many products can skip repeated scans.
+        """
+        classification = {
+            'harmful_additives': [],
+            'ultra_processed_markers': [],
+            'beneficial_ingredients': [],
+            'other': []
+        }
+        
+        # Harmful additives take priority over processing markers, which take
+        # priority over beneficial ingredients
+        matcher = IngredientNormalizer.get_matcher()
+        for ingredient in ingredients:
+            ingredient_lower = ingredient.lower()
+            if cache is None:
+                category = matcher.match(ingredient_lower)
+            elif ingredient_lower in cache:
+                category = cache[ingredient_lower]
+            else:
+                category = cache[ingredient_lower] = matcher.match(ingredient_lower)
+            classification[category or 'other'].append(ingredient)
+        
+        return classification
+
+class NutrientNormalizer:
+    """Normalize nutrient data using official dietary guidelines"""
+    
+    # Based on FDA Daily Values and WHO recommendations
+    DAILY_VALUES = {
+        'calories': 2000,
+        'total_fat': 65,      # grams
+        'saturated_fat': 20,   # grams
+        'trans_fat': 0,        # grams (no safe level)
+        'cholesterol': 300,    # mg
+        'sodium': 2300,        # mg
+        'total_carbs': 300,    # grams
+        'dietary_fiber': 25,   # grams
+        'total_sugars': 50,    # grams (WHO recommendation)
+        'added_sugars': 25,    # grams (WHO recommendation)
+        'protein': 50,         # grams
+    }
+    
+    @staticmethod
+    @METRICS.timed()
+    def normalize_nutrients(raw_nutrients: Dict[str, str], serving_size_g: float = 100) -> Dict[str, NutrientInfo]:
+        """Convert raw nutrient strings to standardized format"""
+        normalized = {}
+        
+        for key, value_str in raw_nutrients.items():
+            try:
+                # Extract numeric value and unit
+                value_match = re.search(r'(\d+\.?\d*)', str(value_str))
+                if not value_match:
+                    continue
+                    
+                value = float(value_match.group(1))
+                unit_match = re.search(r'(mg|g|kcal|cal)', str(value_str).lower())
+                unit = unit_match.group(1) if unit_match else 'g'
+                
+                # Normalize to per 100g
+                per_100g = (value / serving_size_g) * 100 if serving_size_g > 0 else value
+                
+                # Convert units if needed
+                if unit == 'mg' and key.lower() not in ['sodium', 'cholesterol']:
+                    per_100g = per_100g / 1000  # mg to g
+                    unit = 'g'
+                
+                normalized[key.lower().replace(' ', '_')] = NutrientInfo(
+                    name=key,
+                    value=value,
+                    unit=unit,
+                    per_100g=per_100g
+                )
+                
+            except Exception as e:
+                logger.warning(f"Failed to normalize nutrient {key}: {e}")
+                continue
+        
+        logger.debug("Normalized %d nutrients", len(normalized))
+        return normalized
+
+class HealthScorer:
+    """Score products based on established nutritional guidelines"""
+    
+    # Positive factors first, then negative factors; drivers are reported in this order
+    NUTRIENT_RULES = (
+        NutrientRule(
+            nutrient='dietary_fiber',
+            factor="High Fiber Content",
+            impact="positive",
+            threshold=6,
+            rate=1.5,
+            cap=10,
+            explanation="Contains {amount:.1f}g fiber per 100g. High fiber supports digestive health and may reduce chronic disease risk.",
+            source="Dietary Guidelines for Americans 2020-2025"
+        ),
+        NutrientRule(
+            nutrient='protein',
+            factor="Good Protein Source",
+            impact="positive",
+            threshold=12,
+            rate=0.3,
+            cap=8,
+            explanation="Contains {amount:.1f}g protein per 100g. Adequate protein supports muscle health and satiety.",
+            source="FDA Nutrition Facts Label Guidelines"
+        ),
+        NutrientRule(
+            nutrient='sodium',
+            factor="High Sodium Content",
+            impact="negative",
+            threshold=600,
+            rate=0.01,
+            cap=15,
+            explanation="Contains {amount:.0f}mg sodium per 100g. High sodium intake linked to hypertension and cardiovascular disease.",
+            source="American Heart Association Dietary Guidelines",
+            scale=10,  # Convert to mg per 100g
+            excess_only=True,
+            warning="High sodium content may contribute to elevated blood pressure"
+        ),
+        NutrientRule(
+            nutrient='saturated_fat',
+            factor="High Saturated Fat",
+            impact="negative",
+            threshold=5,
+            rate=1.5,
+            cap=12,
+            explanation="Contains {amount:.1f}g saturated fat per 100g. High saturated fat intake may increase cardiovascular risk.",
+            source="WHO Global Strategy on Diet, Physical Activity and Health"
+        ),
+        NutrientRule(
+            nutrient='total_sugars',
+            factor="High Sugar Content",
+            impact="negative",
+            threshold=15,
+            rate=0.5,
+            cap=10,
+            explanation="Contains {amount:.1f}g sugars per 100g. High sugar intake linked to obesity, diabetes, and dental problems.",
+            source="WHO Global Strategy on Diet, Physical Activity and Health"
+        ),
+    )
+    
+    # config.yaml `scoring` keys overriding each nutrient rule's threshold and rate
+    NUTRIENT_RULE_SETTINGS = {
+        'dietary_fiber': ('fiber_threshold_g', 'fiber_multiplier'),
+        'protein': ('protein_threshold_g', 'protein_multiplier'),
+        'sodium': ('sodium_threshold_mg', 'sodium_penalty_rate'),
+        'saturated_fat': ('saturated_fat_threshold_g', 'saturated_fat_penalty_rate'),
+        'total_sugars': ('sugar_threshold_g', 'sugar_penalty_rate'),
+    }
+    
+    def __init__(self, cache_size: int = 2048, rules: Optional[RuleSet] = None,
+                 config_path: Optional[Path] = CONFIG_PATH, reload_check_seconds: float = 2.0):
+        """Rules come from ``rules`` if given, otherwise from ``config_path``,
+        which is re-read whenever it changes (checked at most every
+        ``reload_check_seconds``)."""
+        self._config_path = None if rules is not None else config_path
+        self.reload_check_seconds = reload_check_seconds
+        self._reload_lock = threading.Lock()
+        self._config_stamp = None
+        self._next_reload_check = 0.0
+        self._rules = rules or self.compile_rules({})
+        if self._config_path is not None:
+            self._reload_rules()
+        
+        # Scores memoized by (rule version, product content key)
+        self._score_cache = LRUCache(maxsize=cache_size)
+        self._cached_rule_version = self._rules.version
+        
+        # Evidence sources - all peer-reviewed and authoritative
+        self.sources = [
+            "FDA Nutrition Facts Label Guidelines (2016)",
+            "WHO Global Strategy on Diet, Physical Activity and Health (2004)",
+            "Dietary Guidelines for Americans 2020-2025",
+            "European Food Safety Authority (EFSA) Scientific Opinions",
+            "American Heart Association Dietary Guidelines",
+            "Harvard T.H. Chan School of Public Health Nutrition Source"
+        ]
+    
+    @METRICS.timed()
+    def score_product(self, product: ProductData, classification: Optional[Dict[str, List[str]]] = None) -> HealthScore:
+        """Generate comprehensive health score with evidence
+        
+        Identical products are served from an LRU cache; the returned score may
+        be shared between callers and must not be modified. ``classification``
+        is the product's classify_ingredients result, if already computed.
+        """
+        rules = self.current_rules()
+        if rules.version != self._cached_rule_version:
+            self._score_cache.clear()
+            self._cached_rule_version = rules.version
+        
+        key = (rules.version, product.content_key())
+        score = self._score_cache.get(key)
+        if score is None:
+            score = self._compute_score(product, rules, classification)
+            self._score_cache.put(key, score)
+        else:
+            logger.debug(f"Score cache hit for product: {product.name}")
+        return score
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counters for the score cache"""
+        return self._score_cache.stats()
+    
+    @classmethod
+    def compile_rules(cls, config: Dict) -> RuleSet:
+        """Compile the scoring, confidence and grades sections of config.yaml
+        
+        Missing or empty keys keep the built-in defaults. Any other value must be
+        a finite number (numeric strings are converted); otherwise ValueError
+        is raised, so a reload keeps the previous rules.
+        """
+        scoring = config.get('scoring') or {}
+        confidence = config.get('confidence') or {}
+        grades = config.get('grades') or {}
+        defaults = RuleSet(nutrient_rules=cls.NUTRIENT_RULES)
+        
+        def setting(section: Dict, key: str, default):
+            value = section.get(key)
+            if value is None:
+                return default
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise ValueError(f"Setting {key} must be a number, got {value!r}")
+            if isinstance(value, str):
+                try:
+                    value = float(value)
+                except ValueError:
+                    raise ValueError(f"Setting {key} must be a number, got {value!r}") from None
+            if not math.isfinite(value):
+                raise ValueError(f"Setting {key} must be finite, got {value!r}")
+            # Whole-number settings stay ints so score deltas serialize unchanged
+            if isinstance(default, int) and isinstance(value, float) and value.is_integer():
+                return int(value)
+            return value
+        
+        nutrient_rules = []
+        for rule in cls.NUTRIENT_RULES:
+            threshold_key, rate_key = cls.NUTRIENT_RULE_SETTINGS[rule.nutrient]
+            nutrient_rules.append(replace(
+                rule,
+                threshold=setting(scoring, threshold_key, rule.threshold),
+                rate=setting(scoring, rate_key, rule.rate)
+            ))
+        
+        grade_bands = tuple(sorted(
+            ((band, setting(grades, f"{band}_min", minimum)) for band, minimum in defaults.grade_bands),
+            key=lambda item: item[1], reverse=True
+        ))
+        
+        return RuleSet(
+            nutrient_rules=tuple(nutrient_rules),
+            base_score=setting(scoring, 'base_score', defaults.base_score),
+            min_score=setting(scoring, 'min_score', defaults.min_score),
+            max_score=setting(scoring, 'max_score', defaults.max_score),
+            harmful_additive_penalty=setting(scoring, 'harmful_additive_penalty', defaults.harmful_additive_penalty),
+            ultra_processed_penalty=setting(scoring, 'ultra_processed_penalty', defaults.ultra_processed_penalty),
+            ultra_processed_threshold=setting(scoring, 'ultra_processed_threshold', defaults.ultra_processed_threshold),
+            beneficial_ingredient_bonus=setting(scoring, 'beneficial_ingredient_bonus', defaults.beneficial_ingredient_bonus),
+            grade_bands=grade_bands,
+            nutrients_weight=setting(confidence, 'nutrients_weight', defaults.nutrients_weight),
+            ingredients_weight=setting(confidence, 'ingredients_weight', defaults.ingredients_weight),
+            barcode_weight=setting(confidence, 'barcode_weight', defaults.barcode_weight),
+            brand_weight=setting(confidence, 'brand_weight', defaults.brand_weight),
+            confidence_high=setting(confidence, 'high_threshold', defaults.confidence_high),
+            confidence_medium=setting(confidence, 'medium_threshold', defaults.confidence_medium)
+        )
+    
+    def current_rules(self) -> RuleSet:
+        """The active rule set, reloading it first if config.yaml has changed"""
+        if self._config_path is not None and time.monotonic() >= self._next_reload_check:
+            self._reload_rules()
+        return self._rules
+    
+    def _reload_rules(self):
+        # Only one thread re-reads the file; the others keep using the current rules
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_reload_check = time.monotonic() + self.reload_check_seconds
+            try:
+                stat = self._config_path.stat()
+            except OSError:
+                return
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if stamp == self._config_stamp:
+                return
+            
+            import yaml
+            
+            try:
+                with open(self._config_path, encoding="utf-8") as f:
+                    config = yaml.safe_load(f) or {}
+                rules = self.compile_rules(config)
+            except Exception as e:
+                logger.warning(f"Keeping scoring rules {self._rules.version}: could not load {self._config_path}: {e}")
+                return
+            finally:
+                self._config_stamp = stamp
+            
+            if rules.version != self._rules.version:
+                logger.info(f"Loaded scoring rules {rules.version} from {self._config_path}")
+            self._rules = rules
+        finally:
+            self._reload_lock.release()
+    
+    def _compute_score(self, product: ProductData, rules: Optional[RuleSet] = None,
+                       classification: Optional[Dict[str, List[str]]] = None) -> HealthScore:
+        """Score a product without consulting the cache"""
+        rules = rules or self.current_rules()
+        logger.debug("Scoring product: %s", product.name)
+        
+        base_score = rules.base_score  # Start neutral
+        drivers = []
+        warnings = []
+        confidence_factors = []
+        
+        # Score based on nutrients
+        if product.nutrients:
+            nutrient_score, nutrient_drivers, nutrient_warnings = self._score_nutrients(product.nutrients, rules)
+            base_score += nutrient_score
+            drivers.extend(nutrient_drivers)
+            warnings.extend(nutrient_warnings)
+            confidence_factors.append("nutrients")
+        
+        # Score based on ingredients
+        if product.ingredients:
+            ingredient_score, ingredient_drivers, ingredient_warnings = self._score_ingredients(
+                product.ingredients, rules=rules, classification=classification
+            )
+            base_score += ingredient_score
+            drivers.extend(ingredient_drivers)
+            warnings.extend(ingredient_warnings)
+            confidence_factors.append("ingredients")
+        
+        # Ensure score is within bounds
+        final_score = max(rules.min_score, min(rules.max_score, int(base_score)))
+        
+        # Determine band (like Nutri-Score)
+        band = rules.band_for(final_score)
+        
+        # Determine confidence
+        confidence = self._calculate_confidence(confidence_factors, product, rules)
+        
+        logger.debug("Final score: %d (Band %s)", final_score, band)
+        
+        return HealthScore(
+            overall_score=final_score,
+            band=band,
+            drivers=drivers,
+            evidence_sources=self.sources,
+            confidence=confidence,
+            warnings=warnings,
+            rule_version=rules.version
+        )
+    
+    @METRICS.timed()
+    def score_batch(self, products: Iterable[ProductData],
+                    classifications: Optional[List[Optional[Dict[str, List[str]]]]] = None) -> List[HealthScore]:
+        """Score many products at once; results match score_product exactly
+        
+        ``classifications`` optionally holds each product's classify_ingredients
+        result (None where not computed), so products are not classified twice.
+        """
+        products = list(products)
+        if not products:
+            return []
+        
+        rules = self.current_rules()
+        columns = self._score_columns(products, rules, classifications)
+        
+        # Plain lists are much cheaper to index element-wise than arrays
+        applies_rows = columns['applies'].tolist()
+        capped_rows = columns['capped'].tolist()
+        raw_rows = columns['raw'].tolist()
+        amount_rows = columns['amounts'].tolist()
+        final_scores = columns['overall_score'].tolist()
+        bands = columns['band'].tolist()
+        confidences = columns['confidence'].tolist()
+        
+        scores = []
+        for row, product in enumerate(products):
+            drivers = []
+            warnings = []
+            if product.nutrients:
+                for col, rule in enumerate(rules.nutrient_rules):
+                    if applies_rows[row][col]:
+                        magnitude = rule.cap if capped_rows[row][col] else raw_rows[row][col]
+                        delta = magnitude if rule.impact == "positive" else -magnitude
+                        drivers.append(self._nutrient_driver(rule, amount_rows[row][col], delta))
+                        if rule.warning:
+                            warnings.append(rule.warning)
+            _, ingredient_drivers, ingredient_warnings = columns['ingredient_results'][row]
+            drivers.extend(ingredient_drivers)
+            warnings.extend(ingredient_warnings)
+            
+            scores.append(HealthScore(
+                overall_score=final_scores[row],
+                band=bands[row],
+                drivers=drivers,
+                evidence_sources=self.sources,
+                confidence=confidences[row],
+                warnings=warnings,
+                rule_version=rules.version
+            ))
+        
+        logger.info(f"Scored batch of {len(products)} products")
+        return scores
+    
+    def score_frame(self, products: Iterable[ProductData]) -> "pd.DataFrame":
+        """Columnar equivalent of score_batch without building driver objects
+        
+        One row per product with the per-nutrient deltas, the ingredient delta,
+        overall score, band and confidence.
+        """
+        import pandas as pd
+        
+        products = list(products)
+        rules = self.current_rules()
+        columns = self._score_columns(products, rules)
+        frame = pd.DataFrame({
+            f"{rule.nutrient}_delta": columns['deltas'][:, col]
+            for col, rule in enumerate(rules.nutrient_rules)
+        })
+        frame['ingredient_delta'] = columns['ingredient_scores']
+        frame['overall_score'] = columns['overall_score']
+        frame['band'] = columns['band']
+        frame['confidence'] = columns['confidence']
+        frame['rule_version'] = rules.version
+        frame.index = pd.Index([product.barcode for product in products], name='barcode')
+        return frame
+    
+    def _score_columns(self, products: List[ProductData], rules: RuleSet,
+                       classifications: Optional[List[Optional[Dict[str, List[str]]]]] = None) -> Dict[str, "np.ndarray"]:
+        """Evaluate the scoring rules over a products x nutrients matrix"""
+        import numpy as np
+        
+        nutrient_rules = rules.nutrient_rules
+        
+        # Scaled per-100g amounts, NaN where a product lacks the nutrient
+        amounts = np.array([
+            [
+                product.nutrients[rule.nutrient].per_100g if rule.nutrient in product.nutrients else np.nan
+                for rule in nutrient_rules
+            ]
+            for product in products
+        ], dtype=float).reshape(len(products), len(nutrient_rules))
+        amounts *= rules.array('scales')
+        
+        # Comparisons against NaN are False, so missing nutrients never apply
+        positive = rules.array('positive')
+        thresholds = rules.array('thresholds')
+        applies = np.where(positive, amounts >= thresholds, amounts > thresholds)
+        raw = np.where(rules.array('excess_only'), amounts - thresholds, amounts) * rules.array('rates')
+        caps = rules.array('caps')
+        capped = ~(raw < caps)  # min(cap, x) keeps the cap on ties, like the builtin
+        deltas = np.where(applies, np.where(positive, 1.0, -1.0) * np.minimum(caps, raw), 0.0)
+        
+        # Accumulate in rule order so float rounding matches the scalar path
+        nutrient_scores = np.zeros(len(products))
+        for col in range(len(nutrient_rules)):
+            nutrient_scores = nutrient_scores + deltas[:, col]
+        
+        # Catalogues repeat the same ingredients constantly, so classify each one once
+        category_cache = {}
+        classifications = classifications or [None] * len(products)
+        ingredient_results = [
+            self._score_ingredients(product.ingredients, category_cache, rules, classification)
+            if product.ingredients else (0, [], [])
+            for product, classification in zip(products, classifications)
+        ]
+        ingredient_scores = np.array([result[0] for result in ingredient_results], dtype=float)
+        
+        final_scores = np.clip(
+            np.trunc(rules.base_score + nutrient_scores + ingredient_scores), rules.min_score, rules.max_score
+        ).astype(int)
+        bands = rules.array('band_labels')[np.digitize(final_scores, rules.array('band_edges'))]
+        
+        confidence_points = (
+            np.array([bool(product.nutrients) for product in products]) * rules.nutrients_weight
+            + np.array([bool(product.ingredients) for product in products]) * rules.ingredients_weight
+            + np.array([bool(product.barcode) for product in products]) * rules.barcode_weight
+            + np.array([bool(product.brand) for product in products]) * rules.brand_weight
+        )
+        confidences = np.select(
+            [confidence_points >= rules.confidence_high, confidence_points >= rules.confidence_medium],
+            ["high", "medium"], default="low"
+        )
+        
+        return {
+            'amounts': amounts,
+            'applies': applies,
+            'raw': raw,
+            'capped': capped,
+            'deltas': deltas,
+            'ingredient_results': ingredient_results,
+            'ingredient_scores': ingredient_scores,
+            'overall_score': final_scores,
+            'band': bands,
+            'confidence': confidences
+        }
+    
+    @METRICS.timed()
+    def _score_nutrients(self, nutrients: Dict[str, NutrientInfo], rules: Optional[RuleSet] = None) -> Tuple[float, List[ScoreDriver], List[str]]:
+        """Score based on nutrient profile"""
+        rules = rules or self.current_rules()
+        score_delta = 0
+        drivers = []
+        warnings = []
+        
+        for rule in rules.nutrient_rules:
+            if rule.nutrient not in nutrients:
+                continue
+            amount = nutrients[rule.nutrient].per_100g * rule.scale
+            if rule.applies(amount):
+                delta = rule.delta(amount)
+                score_delta += delta
+                drivers.append(self._nutrient_driver(rule, amount, delta))
+                if rule.warning:
+                    warnings.append(rule.warning)
+        
+        return score_delta, drivers, warnings
+    
+    @staticmethod
+    def _nutrient_driver(rule: NutrientRule, amount: float, delta: float) -> ScoreDriver:
+        return ScoreDriver(
+            factor=rule.factor,
+            impact=rule.impact,
+            score_delta=delta,
+            explanation=rule.explanation.format(amount=amount),
+            source=rule.source
+        )
+    
+    @METRICS.timed()
+    def _score_ingredients(self, ingredients: List[str], category_cache: Optional[Dict[str, Optional[str]]] = None,
+                           rules: Optional[RuleSet] = None, classification: Optional[Dict[str, List[str]]] = None
+                           ) -> Tuple[float, List[ScoreDriver], List[str]]:
+        """Score based on ingredient quality, classifying them unless ``classification`` is given"""
+        rules = rules or self.current_rules()
+        score_delta = 0
+        drivers = []
+        warnings = []
+        
+        if classification is None:
+            classification = IngredientNormalizer.classify_ingredients(ingredients, category_cache)
+        
+        # Penalize harmful additives
+        harmful_count = len(classification['harmful_additives'])
+        if harmful_count > 0:
+            delta = -min(rules.harmful_additive_cap, harmful_count * rules.harmful_additive_penalty)
+            score_delta += delta
+            drivers.append(ScoreDriver(
+                factor="Harmful Additives Present",
+                impact="negative",
+                score_delta=delta,
+                explanation=f"Contains {harmful_count} potentially harmful additive(s): {', '.join(classification['harmful_additives'][:3])}. Some additives linked to health concerns in studies.",
+                source="EFSA Scientific Opinions on Food Additives"
+            ))
+            warnings.append("Contains additives that some studies suggest may have negative health effects")
+        
+        # Penalize ultra-processed markers
+        processed_count = len(classification['ultra_processed_markers'])
+        if processed_count > rules.ultra_processed_threshold:
+            delta = -min(rules.ultra_processed_cap, processed_count * rules.ultra_processed_penalty)
+            score_delta += delta
+            drivers.append(ScoreDriver(
+                factor="Highly Processed Food",
+                impact="negative",
+                score_delta=delta,
+                explanation=f"Contains {processed_count} ultra-processing markers. Ultra-processed foods associated with increased chronic disease risk.",
+                source="Harvard T.H. Chan School of Public Health"
+            ))
+        
+        # Reward beneficial ingredients
+        beneficial_count = len(classification['beneficial_ingredients'])
+        if beneficial_count > 0:
+            delta = min(rules.beneficial_ingredient_cap, beneficial_count * rules.beneficial_ingredient_bonus)
+            score_delta += delta
+            drivers.append(ScoreDriver(
+                factor="Beneficial Ingredients",
+                impact="positive",
+                score_delta=delta,
+                explanation=f"Contains {beneficial_count} beneficial ingredient(s): {', '.join(classification['beneficial_ingredients'][:3])}. These support nutritional quality.",
+                source="Dietary Guidelines for Americans 2020-2025"
+            ))
+        
+        return score_delta, drivers, warnings
+    
+    def _calculate_confidence(self, confidence_factors: List[str], product: ProductData,
+                              rules: Optional[RuleSet] = None) -> str:
+        """Calculate confidence level in the score"""
+        rules = rules or self.current_rules()
+        score = 0
+        
+        if "nutrients" in confidence_factors:
+            score += rules.nutrients_weight
+        if "ingredients" in confidence_factors:
+            score += rules.ingredients_weight
+        if product.barcode:
+            score += rules.barcode_weight
+        if product.brand:
+            score += rules.brand_weight
+        
+        return rules.confidence_for(score)
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with an optional time-to-live per entry"""
+    
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections shared between threads
+    
+    A connection is used by one thread at a time. Nested ``connection()`` calls
+    from the same thread reuse the connection it already holds, and only the
+    outermost call commits or rolls back.
+    """
+    
+    def __init__(self, db_path: str, size: int = 4, pragmas: Optional[Dict[str, object]] = None,
+                 cached_statements: int = 128, timeout: float = 30.0):
+        self.db_path = db_path
+        # Every connection to ":memory:" would be a separate database
+        self.size = 1 if db_path == ":memory:" else max(1, size)
+        self.pragmas = pragmas or {}
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        for pragma, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+    
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"Timed out waiting for a connection to {self.db_path}")
+    
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of one transaction"""
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+        
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+    
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+class ProductDatabase:
+    """Simple SQLite database for storing product history"""
+    
+    def __init__(self, db_path: Optional[str] = None, settings: Optional[Dict] = None):
+        # Settings come from the `database` section of config.yaml
+        if settings is None:
+            settings = load_config().get("database") or {}
+        self.db_path = db_path or settings.get("path", "products.db")
+        self.pool = ConnectionPool(
+            self.db_path,
+            size=settings.get("pool_size", 4),
+            pragmas={
+                "journal_mode": settings.get("journal_mode", "WAL"),
+                "synchronous": settings.get("synchronous", "NORMAL"),
+                "cache_size": -int(settings.get("cache_size_kb", 8192)),
+                "busy_timeout": int(settings.get("busy_timeout_ms", 5000)),
+                "temp_store": "MEMORY"
+            },
+            cached_statements=settings.get("cached_statements", 128)
+        )
+        self.bulk_chunk_size = settings.get("bulk_chunk_size", 5000)
+        self.search_rank_window = settings.get("search_rank_window", 2000)
+        # Read-through cache for barcode lookups; cached objects are shared, treat them as read-only
+        self._barcode_cache = LRUCache(
+            maxsize=settings.get("lookup_cache_size", 4096),
+            ttl=settings.get("lookup_cache_ttl_seconds", 300)
+        )
+        # data_hash -> stored health_score JSON, used to skip redundant writes
+        self._persisted = LRUCache(maxsize=settings.get("lookup_cache_size", 4096))
+        self._writer: Optional[BackgroundWriter] = None
+        self._writer_lock = threading.Lock()
+        self._init_database()
+    
+    @METRICS.timed()
+    def close(self):
+        """Flush queued writes and close pooled connections"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.pool.close()
+    
+    def _init_database(self):
+        """Initialize the database schema"""
+        with self.pool.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS products (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    barcode TEXT,
+                    name TEXT NOT NULL,
+                    brand TEXT,
+                    data_hash TEXT UNIQUE,
+                    product_data TEXT,
+                    health_score TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    overall_score INTEGER,
+                    band TEXT,
+                    confidence TEXT,
+                    rule_version TEXT
+                )
+            """)
+            
+            self._migrate_score_columns(conn)
+            
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_barcode ON products(barcode)
+            """)
+            
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_name ON products(name)
+            """)
+            
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_updated_at ON products(updated_at)
+            """)
+            
+            for column in self.SCORE_COLUMNS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{column} ON products({column})")
+        
+        self.fts_enabled = self._init_search_index()
+    
+    def _init_search_index(self) -> bool:
+        """Create the FTS5 index over name and brand, returning False if FTS5 is unavailable"""
+        try:
+            with self.pool.connection() as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+                ).fetchone()
+                conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                        name, brand,
+                        content='products', content_rowid='id',
+                        prefix='2 3 4 5 6', tokenize='unicode61 remove_diacritics 2'
+                    )
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+                        INSERT INTO products_fts(rowid, name, brand) VALUES (new.id, new.name, new.brand);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+                        INSERT INTO products_fts(products_fts, rowid, name, brand)
+                        VALUES ('delete', old.id, old.name, old.brand);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, brand ON products BEGIN
+                        INSERT INTO products_fts(products_fts, rowid, name, brand)
+                        VALUES ('delete', old.id, old.name, old.brand);
+                        INSERT INTO products_fts(rowid, name, brand) VALUES (new.id, new.name, new.brand);
+                    END
+                """)
+                if not exists:
+                    # Index rows saved before the search index existed
+                    conn.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 unavailable, falling back to LIKE search: {e}")
+            return False
+    
+    # Copied out of the health_score JSON so stats and filters can use indexes
+    SCORE_COLUMNS = {
+        'overall_score': 'INTEGER',
+        'band': 'TEXT',
+        'confidence': 'TEXT',
+        'rule_version': 'TEXT'
+    }
+    
+    def _migrate_score_columns(self, conn: sqlite3.Connection):
+        """Add score columns to databases created before they existed and backfill them"""
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(products)")}
+        missing = [column for column in self.SCORE_COLUMNS if column not in existing]
+        if not missing:
+            return
+        
+        for column in missing:
+            conn.execute(f"ALTER TABLE products ADD COLUMN {column} {self.SCORE_COLUMNS[column]}")
+        conn.execute("""
+            UPDATE products SET
+                overall_score = json_extract(health_score, '$.overall_score'),
+                band = json_extract(health_score, '$.band'),
+                confidence = json_extract(health_score, '$.confidence'),
+                rule_version = json_extract(health_score, '$.rule_version')
+            WHERE health_score IS NOT NULL
+        """)
+        logger.info(f"Migrated products table: added {', '.join(missing)}")
+    
+    # Re-saving an unchanged product and score is a no-op rather than a rewrite
+    INSERT_PRODUCT_SQL = """
+        INSERT INTO products 
+        (barcode, name, brand, data_hash, product_data, health_score, updated_at,
+         overall_score, band, confidence, rule_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(data_hash) DO UPDATE SET
+            product_data = excluded.product_data,
+            health_score = excluded.health_score,
+            updated_at = excluded.updated_at,
+            overall_score = excluded.overall_score,
+            band = excluded.band,
+            confidence = excluded.confidence,
+            rule_version = excluded.rule_version
+        WHERE products.health_score IS NOT excluded.health_score
+    """
+    
+    @staticmethod
+    @METRICS.timed()
+    def _product_row(product: ProductData, score: HealthScore) -> Tuple:
+        """Hash and serialize a product into a row for INSERT_PRODUCT_SQL"""
+        product_dict = product.to_dict()
+        data_hash = _content_hash(product_dict)
+        return (
+            product.barcode,
+            product.name,
+            product.brand,
+            data_hash,
+            json.dumps(product_dict),
+            json.dumps(score.to_dict()),
+            datetime.datetime.now().isoformat(),
+            score.overall_score,
+            score.band,
+            score.confidence,
+            score.rule_version
+        )
+    
+    @METRICS.timed()
+    def save_product(self, product: ProductData, score: HealthScore) -> str:
+        """Save product and score to database, skipping the write if nothing changed"""
+        row = self._product_row(product, score)
+        if self._is_persisted(row):
+            logger.debug(f"Product {product.name} unchanged, skipping write")
+            return row[3]
+        
+        with self.pool.connection() as conn:
+            conn.execute(self.INSERT_PRODUCT_SQL, row)
+        self._mark_persisted([row])
+        
+        logger.debug("Saved product %s to database", product.name)
+        return row[3]
+    
+    @METRICS.timed()
+    def save_product_async(self, product: ProductData, score: HealthScore) -> str:
+        """Queue a save on the background writer so callers never wait on disk
+        
+        Unchanged products are dropped before they reach the queue.
+        """
+        row = self._product_row(product, score)
+        if not self._is_persisted(row):
+            if self._writer is None:
+                with self._writer_lock:
+                    if self._writer is None:
+                        self._writer = BackgroundWriter(self)
+            self._writer.submit(product, score)
+        return row[3]
+    
+    @METRICS.timed()
+    def flush(self):
+        """Wait until every queued background save has been written"""
+        if self._writer is not None:
+            self._writer.flush()
+    
+    @METRICS.timed()
+    def _is_persisted(self, row: Tuple) -> bool:
+        """True if this data_hash is already stored with an identical score"""
+        data_hash, score_json = row[3], row[5]
+        stored = self._persisted.get(data_hash)
+        if stored is None:
+            with self.pool.connection() as conn:
+                found = conn.execute(
+                    "SELECT health_score FROM products WHERE data_hash = ?", (data_hash,)
+                ).fetchone()
+            if found is None:
+                return False
+            stored = found[0]
+            self._persisted.put(data_hash, stored)
+        return stored == score_json
+    
+    def _mark_persisted(self, rows: List[Tuple]):
+        for row in rows:
+            self._persisted.put(row[3], row[5])
+            self._barcode_cache.invalidate(row[0])
+    
+    @METRICS.timed()
+    def save_products(self, items: Iterable[Tuple[ProductData, HealthScore]], chunk_size: Optional[int] = None) -> List[str]:
+        """Save many (product, score) pairs using one transaction per chunk
+        
+        Returns the data hashes in input order. ``items`` is consumed lazily, so
+        generators of any length can be ingested with bounded memory.
+        """
+        chunk_size = chunk_size or self.bulk_chunk_size
+        data_hashes = []
+        chunk = []
+        start = time.perf_counter()
+        
+        for product, score in items:
+            row = self._product_row(product, score)
+            chunk.append(row)
+            data_hashes.append(row[3])
+            if len(chunk) >= chunk_size:
+                self._insert_rows(chunk)
+                chunk = []
+        if chunk:
+            self._insert_rows(chunk)
+        
+        elapsed = time.perf_counter() - start
+        rate = len(data_hashes) / elapsed if elapsed > 0 else float(len(data_hashes))
+        logger.info(f"Saved {len(data_hashes)} products in {elapsed:.2f}s ({rate:.0f} rows/s)")
+        return data_hashes
+    
+    @METRICS.timed()
+    def _insert_rows(self, rows: List[Tuple]):
+        with self.pool.connection() as conn:
+            conn.executemany(self.INSERT_PRODUCT_SQL, rows)
+        self._mark_persisted(rows)
+    
+    @METRICS.timed()
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counters for the barcode lookup cache"""
+        return self._barcode_cache.stats()
+    
+    @METRICS.timed()
+    def get_product_by_barcode(self, barcode: str) -> Optional[Tuple[ProductData, HealthScore]]:
+        """Retrieve product by barcode, served from the lookup cache when possible"""
+        result = self._barcode_cache.get(barcode, _MISSING)
+        if result is _MISSING:
+            result = self._load_product_by_barcode(barcode)
+            self._barcode_cache.put(barcode, result)
+        return result
+    
+    @METRICS.timed()
+    def _load_product_by_barcode(self, barcode: str) -> Optional[Tuple[ProductData, HealthScore]]:
+        """Retrieve product by barcode from SQLite"""
+        with self.pool.connection() as conn:
+            cursor = conn.execute("""
+                SELECT product_data, health_score FROM products 
+                WHERE barcode = ? ORDER BY updated_at DESC LIMIT 1
+            """, (barcode,))
+            
+            row = cursor.fetchone()
+            if row:
+                # Load product data and reconstruct NutrientInfo objects
+                product_dict = json.loads(row[0])
+                
+                # Convert nutrient dictionaries back to NutrientInfo objects
+                if 'nutrients' in product_dict and product_dict['nutrients']:
+                    reconstructed_nutrients = {}
+                    for key, nutrient_dict in product_dict['nutrients'].items():
+                        reconstructed_nutrients[key] = NutrientInfo(
+                            name=nutrient_dict['name'],
+                            value=nutrient_dict['value'],
+                            unit=nutrient_dict['unit'],
+                            per_100g=nutrient_dict['per_100g']
+                        )
+                    product_dict['nutrients'] = reconstructed_nutrients
+                
+                product_data = ProductData(**product_dict)
+                
+                # Load health score and reconstruct ScoreDriver objects
+                score_dict = json.loads(row[1])
+                if 'drivers' in score_dict and score_dict['drivers']:
+                    reconstructed_drivers = []
+                    for driver_dict in score_dict['drivers']:
+                        reconstructed_drivers.append(ScoreDriver(
+                            factor=driver_dict['factor'],
+                            impact=driver_dict['impact'],
+                            score_delta=driver_dict['score_delta'],
+                            explanation=driver_dict['explanation'],
+                            source=driver_dict['source']
+                        ))
+                    score_dict['drivers'] = reconstructed_drivers
+                
+                health_score = HealthScore(**score_dict)
+                return product_data, health_score
+        
+        return None
+    
+    @METRICS.timed()
+    def search_products(self, query: str, limit: int = 20) -> List[Tuple[str, str, str]]:
+        """Search products by name or brand
+        
+        With FTS5 every word in the query must prefix-match a word in the name
+        or brand, and the ``search_rank_window`` matches with the highest rowids
+        are ranked by BM25, which bounds the cost of very broad prefixes. Rowids
+        follow insertion order (re-saving a product keeps its row), so when a
+        query matches more rows than the window, matches inserted earlier are
+        not returned. Without FTS5 this falls back to a substring scan ordered
+        by recency.
+        """
+        if not self.fts_enabled:
+            with self.pool.connection() as conn:
+                cursor = conn.execute("""
+                    SELECT DISTINCT name, brand, barcode FROM products 
+                    WHERE name LIKE ? OR brand LIKE ?
+                    ORDER BY updated_at DESC LIMIT ?
+                """, (f"%{query}%", f"%{query}%", limit))
+                
+                return cursor.fetchall()
+        
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"*' for term in terms)
+        
+        with self.pool.connection() as conn:
+            # Over-fetch a little so re-saved duplicates don't shrink the page
+            cursor = conn.execute("""
+                SELECT p.name, p.brand, p.barcode FROM (
+                    SELECT rowid, rank FROM products_fts
+                    WHERE products_fts MATCH :match AND rowid >= (
+                        SELECT COALESCE(MIN(rowid), 0) FROM (
+                            SELECT rowid FROM products_fts WHERE products_fts MATCH :match
+                            ORDER BY rowid DESC LIMIT :window
+                        )
+                    )
+                    ORDER BY rank LIMIT :limit
+                ) AS hits
+                JOIN products p ON p.id = hits.rowid
+                ORDER BY hits.rank
+            """, {'match': match, 'window': self.search_rank_window, 'limit': limit * 3})
+            
+            results = []
+            seen = set()
+            for row in cursor:
+                if row not in seen:
+                    seen.add(row)
+                    results.append(row)
+                    if len(results) == limit:
+                        break
+            return results
+    
+    @METRICS.timed()
+    def get_recent_products(self, limit: int = 20) -> List[Tuple[str, str, str, str]]:
+        """Get recently analyzed products"""
+        with self.pool.connection() as conn:
+            cursor = conn.execute("""
+                SELECT name, brand, barcode, updated_at FROM products 
+                ORDER BY updated_at DESC LIMIT ?
+            """, (limit,))
+            
+            return cursor.fetchall()
+    
+    @METRICS.timed()
+    def get_recent_products_with_scores(self, limit: int = 20, bands: Optional[List[str]] = None,
+                                        confidences: Optional[List[str]] = None) -> List[Tuple[str, str, str, str, Optional[int], Optional[str], Optional[str]]]:
+        """Get recently analyzed products with their score, band and confidence in one query
+        
+        Optionally restricted to the given grade bands and confidence levels.
+        """
+        conditions = []
+        params = []
+        if bands:
+            conditions.append(f"band IN ({', '.join('?' * len(bands))})")
+            params.extend(bands)
+        if confidences:
+            conditions.append(f"confidence IN ({', '.join('?' * len(confidences))})")
+            params.extend(confidences)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f"""
+                SELECT name, brand, barcode, updated_at, overall_score, band, confidence
+                FROM products {where}
+                ORDER BY updated_at DESC LIMIT ?
+            """, (*params, limit))
+            
+            return cursor.fetchall()
+    
+    @METRICS.timed()
+    def get_stats(self) -> Dict[str, object]:
+        """Summary statistics for the about page"""
+        with self.pool.connection() as conn:
+            total_products, unique_brands, avg_score = conn.execute("""
+                SELECT COUNT(*), COUNT(DISTINCT brand), AVG(overall_score) FROM products
+            """).fetchone()
+            band_counts = dict(conn.execute("""
+                SELECT band, COUNT(*) FROM products WHERE band IS NOT NULL GROUP BY band
+            """).fetchall())
+        
+        return {
+            'total_products': total_products,
+            'unique_brands': unique_brands,
+            'average_score': avg_score,
+            'band_counts': band_counts
+        }
+
+class OCRBusyError(RuntimeError):
+    """Raised when the OCR queue is full"""
+
+class OCRService:
+    """Bounded pool of OCR workers with results cached by image content hash
+    
+    Images are preprocessed (see ocr_preprocessing) before Tesseract runs.
+    Identical images are never OCR'd twice: finished text is served from an LRU
+    cache and a request for an image already being processed shares its future.
+    At most ``workers`` images are processed and ``max_queue`` more wait; beyond
+    that submit() raises OCRBusyError instead of queueing without bound.
+    """
+    
+    def __init__(self, workers: int = 2, max_queue: int = 8, cache_size: int = 256,
+                 tesseract_cmd: Optional[str] = None, preprocess: Optional[Dict] = None):
+        self.tesseract_cmd = tesseract_cmd
+        # Settings for ocr_preprocessing.preprocess_image; part of the cache key
+        self.preprocess = dict(preprocess or {})
+        self._preprocess_key = json.dumps(self.preprocess, sort_keys=True).encode()
+        self._preprocess_settings = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._cache = LRUCache(maxsize=cache_size)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._durations = deque(maxlen=20)
+    
+    def image_key(self, image_bytes: bytes) -> str:
+        return hashlib.sha256(self._preprocess_key + b"\0" + image_bytes).hexdigest()
+    
+    def cached_text(self, image_bytes: bytes) -> Optional[str]:
+        return self._cache.get(self.image_key(image_bytes))
+    
+    def submit(self, image_bytes: bytes) -> Future:
+        """Return a future for the image's text, starting OCR only if needed"""
+        key = self.image_key(image_bytes)
+        text = self._cache.get(key)
+        if text is not None:
+            future = Future()
+            future.set_result(text)
+            return future
+        
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if not self._slots.acquire(blocking=False):
+                raise OCRBusyError("OCR queue is full")
+            future = self._executor.submit(self._run, key, image_bytes)
+            self._inflight[key] = future
+        return future
+    
+    def pending(self) -> int:
+        """Images currently being processed or waiting for a worker"""
+        with self._lock:
+            return len(self._inflight)
+    
+    def average_seconds(self) -> Optional[float]:
+        """Mean duration of recent OCR runs, for progress estimates"""
+        durations = list(self._durations)
+        return sum(durations) / len(durations) if durations else None
+    
+    def close(self):
+        self._executor.shutdown(wait=True)
+    
+    def _run(self, key: str, image_bytes: bytes) -> str:
+        try:
+            start = time.perf_counter()
+            text = self._extract(image_bytes)
+            self._durations.append(time.perf_counter() - start)
+            self._cache.put(key, text)
+            return text
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            self._slots.release()
+    
+    def _extract(self, image_bytes: bytes) -> str:
+        import pytesseract
+        from PIL import Image
+        from ocr_preprocessing import PreprocessSettings, preprocess_image
+        if self.tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        if self._preprocess_settings is None:
+            self._preprocess_settings = PreprocessSettings.from_config(self.preprocess)
+        image = preprocess_image(Image.open(io.BytesIO(image_bytes)), self._preprocess_settings)
+        return pytesseract.image_to_string(image)
+
+class BackgroundWriter:
+    """Daemon thread that persists queued saves in batches via save_products"""
+    
+    def __init__(self, db: ProductDatabase, max_queue: int = 1000, batch_size: int = 100):
+        self.db = db
+        self.batch_size = batch_size
+        # A full queue blocks submitters, which bounds memory under sustained load
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="product-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, product: ProductData, score: HealthScore):
+        self._queue.put((product, score))
+    
+    def flush(self):
+        self._queue.join()
+    
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while item is not None and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            
+            pending = [entry for entry in batch if entry is not None]
+            try:
+                if pending:
+                    self.db.save_products(pending)
+            except Exception as e:
+                logger.error(f"Background save of {len(pending)} products failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(pending) < len(batch):
+                return
+
+# Open Food Facts nutriment fields and the raw nutrient names/units they map to
+OFF_NUTRIMENT_FIELDS = [
+    ("energy-kcal_100g", "calories", "kcal"),
+    ("fat_100g", "total_fat", "g"),
+    ("saturated-fat_100g", "saturated_fat", "g"),
+    ("sodium_100g", "sodium", "mg"),
+    ("carbohydrates_100g", "total_carbohydrates", "g"),
+    ("fiber_100g", "dietary_fiber", "g"),
+    ("sugars_100g", "total_sugars", "g"),
+    ("proteins_100g", "protein", "g")
+]
+
+def product_from_open_food_facts(barcode: str, off_product: Dict) -> ProductData:
+    """Normalize an Open Food Facts product record into ProductData"""
+    serving_size = 100.0
+    if off_product.get("serving_size"):
+        match = re.search(r"(\d+\.?\d*)\s*g", str(off_product["serving_size"]))
+        if match:
+            serving_size = float(match.group(1))
+    
+    nutriments = off_product.get("nutriments") or {}
+    raw_nutrients = {}
+    for field, nutrient, unit in OFF_NUTRIMENT_FIELDS:
+        if field in nutriments:
+            raw_nutrients[nutrient] = f"{nutriments[field]}{unit}"
+    
+    return ProductData(
+        barcode=barcode,
+        # The dumps carry explicit nulls for missing text fields
+        name=off_product.get("product_name") or "",
+        brand=off_product.get("brands") or "",
+        ingredients=IngredientNormalizer.normalize_ingredient_list(off_product.get("ingredients_text") or ""),
+        nutrients=NutrientNormalizer.normalize_nutrients(raw_nutrients, serving_size),
+        serving_size_g=serving_size,
+        categories=[]
+    )
+
+def product_from_record(record: Dict) -> ProductData:
+    """Build ProductData from a raw or already-normalized product record
+    
+    Ingredients may be raw text or a normalized list; nutrients may be raw
+    strings such as "12g" or NutrientInfo dicts as produced by ProductData.
+    """
+    serving_size = float(record.get("serving_size_g") or 100)
+    
+    ingredients = record.get("ingredients") or []
+    if isinstance(ingredients, str):
+        ingredients = IngredientNormalizer.normalize_ingredient_list(ingredients)
+    
+    nutrients = record.get("nutrients") or {}
+    if all(isinstance(value, dict) for value in nutrients.values()):
+        nutrients = {key: NutrientInfo(**value) for key, value in nutrients.items()}
+    else:
+        nutrients = NutrientNormalizer.normalize_nutrients(nutrients, serving_size)
+    
+    return ProductData(
+        barcode=str(record.get("barcode") or ""),
+        name=record.get("name", ""),
+        brand=record.get("brand", ""),
+        ingredients=ingredients,
+        nutrients=nutrients,
+        serving_size_g=serving_size,
+        categories=list(record.get("categories") or [])
+    )
+
+@dataclass
+class ProductJob:
+    """Work item passed through the product pipeline"""
+    product: Optional[ProductData] = None
+    record: Optional[Dict] = None
+    classification: Optional[Dict[str, List[str]]] = None
+    score: Optional[HealthScore] = None
+
+def build_product_pipeline(scorer: HealthScorer, db: Optional[ProductDatabase] = None,
+                           batch_size: int = 500, persist_async: bool = False) -> Pipeline:
+    """normalize -> classify -> score -> persist, shared by the UI and batch jobs
+    
+    Jobs carrying a raw ``record`` are normalized, and dropped if the record
+    cannot be; jobs that already have a ``product`` pass straight through. Without a database the persist stage is
+    omitted. ``persist_async`` hands saves to the background writer instead of
+    waiting for them, which is what the UI wants.
+    """
+    category_cache: Dict[str, Optional[str]] = {}
+    
+    def normalize(job: ProductJob) -> Optional[ProductJob]:
+        if job.product is None:
+            try:
+                job.product = product_from_record(job.record)
+            except Exception as e:
+                logger.debug(f"Skipping record {job.record.get('barcode')}: {e}")
+                return None
+        return job
+    
+    def classify(job: ProductJob) -> ProductJob:
+        if len(category_cache) > 100000:
+            category_cache.clear()
+        job.classification = IngredientNormalizer.classify_ingredients(job.product.ingredients, category_cache)
+        return job
+    
+    def score(jobs: List[ProductJob]) -> List[ProductJob]:
+        # A lone product goes through the memoized path; batches use the vectorized one.
+        # Both reuse the classify stage's result rather than classifying again.
+        if len(jobs) == 1:
+            jobs[0].score = scorer.score_product(jobs[0].product, jobs[0].classification)
+        else:
+            products = [job.product for job in jobs]
+            classifications = [job.classification for job in jobs]
+            for job, result in zip(jobs, scorer.score_batch(products, classifications)):
+                job.score = result
+        return jobs
+    
+    def persist(jobs: List[ProductJob]) -> List[ProductJob]:
+        if persist_async:
+            for job in jobs:
+                db.save_product_async(job.product, job.score)
+        else:
+            db.save_products([(job.product, job.score) for job in jobs])
+        return jobs
+    
+    stages = [
+        Stage("normalize", normalize),
+        Stage("classify", classify),
+        Stage("score", score, batch_size=batch_size)
+    ]
+    if db is not None:
+        stages.append(Stage("persist", persist, batch_size=batch_size))
+    return Pipeline(stages)
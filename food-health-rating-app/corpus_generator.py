@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Synthetic product corpus generator
+
+Streams any number of realistic products for load testing. Each product is
+drawn from a category profile: per-100g nutrient distributions typical of
+the category, a serving size, and an ingredient list that mixes the
+category's staple ingredients with terms from IngredientNormalizer's
+HARMFUL_ADDITIVES, ULTRA_PROCESSED_MARKERS and BENEFICIAL_INGREDIENTS
+vocabularies in category-specific proportions.
+
+The same seed always yields the same corpus, and a shorter corpus is a
+prefix of a longer one. Records use the raw format batch_score.py reads
+(label-style strings such as "12.5g"), so CSV and JSONL output can be fed
+straight back into the scoring tools.
+
+    python corpus_generator.py --count 100000 --seed 7 --output corpus.jsonl.gz
+    python corpus_generator.py --count 1000000 --format db
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import logging
+import random
+import sys
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from core import HealthScorer, IngredientNormalizer, ProductData, ProductDatabase, load_config, product_from_record
+from logging_config import configure_logging
+
+# Raw nutrient keys written for every product, in label order
+NUTRIENT_KEYS = [
+    "calories", "total_fat", "saturated_fat", "sodium", "total_carbohydrates",
+    "dietary_fiber", "total_sugars", "protein"
+]
+CSV_COLUMNS = ["barcode", "name", "brand", "ingredients", "serving_size_g", "categories"] + NUTRIENT_KEYS
+
+@dataclass(frozen=True)
+class CategoryProfile:
+    """How products of one category look; nutrient ranges are (mean, sd) per 100g"""
+    categories: Tuple[str, ...]
+    share: float                              # Fraction of the corpus
+    adjectives: Tuple[str, ...]
+    nouns: Tuple[str, ...]
+    brands: Tuple[str, ...]
+    staples: Tuple[str, ...]                  # Ordinary ingredients listed first
+    serving_sizes: Tuple[float, ...]
+    fat: Tuple[float, float]
+    carbohydrates: Tuple[float, float]
+    protein: Tuple[float, float]
+    fiber: Tuple[float, float]
+    sodium_mg: Tuple[float, float]
+    sugar_share: Tuple[float, float]          # Sugars as a share of carbohydrates (low, high)
+    saturated_share: Tuple[float, float]      # Saturated fat as a share of fat (low, high)
+    # Weights for drawing 0, 1, 2, ... terms from each vocabulary
+    harmful_counts: Tuple[float, ...]
+    ultra_processed_counts: Tuple[float, ...]
+    beneficial_counts: Tuple[float, ...]
+
+CATEGORY_PROFILES: Dict[str, CategoryProfile] = {
+    "cereal": CategoryProfile(
+        categories=("breakfast", "cereal"), share=0.12,
+        adjectives=("Crunchy", "Honey", "Toasted", "Multigrain", "Frosted", "Ancient Grain"),
+        nouns=("Flakes", "Granola", "Muesli", "Puffs", "Clusters", "Porridge Oats"),
+        brands=("Morning Harvest", "Healthy Choice", "Golden Fields", "Sunrise Mills"),
+        staples=("wheat flour", "sugar", "rice flour", "corn meal", "malt extract", "honey", "salt"),
+        serving_sizes=(30, 40, 45),
+        fat=(6, 3), carbohydrates=(70, 8), protein=(10, 3), fiber=(7, 3), sodium_mg=(250, 150),
+        sugar_share=(0.05, 0.4), saturated_share=(0.1, 0.3),
+        harmful_counts=(0.8, 0.15, 0.05), ultra_processed_counts=(0.5, 0.3, 0.15, 0.05),
+        beneficial_counts=(0.1, 0.3, 0.4, 0.2)
+    ),
+    "snacks": CategoryProfile(
+        categories=("snack", "salty snacks"), share=0.16,
+        adjectives=("Sea Salt", "Cheddar", "Sour Cream", "Spicy", "Barbecue", "Lightly Salted"),
+        nouns=("Chips", "Crackers", "Pretzels", "Tortilla Chips", "Popcorn", "Rice Cakes"),
+        brands=("Snack Co", "Crunch Time", "Natural Foods Co", "Valley Farms"),
+        staples=("potatoes", "sunflower oil", "corn", "salt", "wheat flour", "cheese powder", "onion powder"),
+        serving_sizes=(28, 30),
+        fat=(25, 8), carbohydrates=(55, 8), protein=(6, 2), fiber=(4, 2), sodium_mg=(600, 250),
+        sugar_share=(0.02, 0.1), saturated_share=(0.1, 0.5),
+        harmful_counts=(0.6, 0.3, 0.1), ultra_processed_counts=(0.2, 0.3, 0.3, 0.2),
+        beneficial_counts=(0.6, 0.3, 0.1)
+    ),
+    "biscuits": CategoryProfile(
+        categories=("snack", "biscuits"), share=0.12,
+        adjectives=("Chocolate Chip", "Butter", "Oatmeal Raisin", "Double Chocolate", "Vanilla", "Ginger"),
+        nouns=("Cookies", "Biscuits", "Wafers", "Sandwich Cookies", "Shortbread"),
+        brands=("Grandma's Kitchen", "Snack Co", "Golden Bakery", "Sweet Valley"),
+        staples=("wheat flour", "sugar", "palm oil", "butter", "cocoa", "eggs", "salt", "baking soda"),
+        serving_sizes=(25, 30),
+        fat=(22, 6), carbohydrates=(65, 6), protein=(6, 1.5), fiber=(2.5, 1.5), sodium_mg=(300, 120),
+        sugar_share=(0.3, 0.55), saturated_share=(0.3, 0.6),
+        harmful_counts=(0.5, 0.35, 0.15), ultra_processed_counts=(0.2, 0.3, 0.3, 0.2),
+        beneficial_counts=(0.7, 0.25, 0.05)
+    ),
+    "beverages": CategoryProfile(
+        categories=("beverages", "soft drinks"), share=0.12,
+        adjectives=("Lemon", "Orange", "Cola", "Berry", "Tropical", "Ginger"),
+        nouns=("Soda", "Sparkling Drink", "Iced Tea", "Juice Drink", "Energy Drink"),
+        brands=("Fizz", "Bright Drinks", "Summer Springs", "Daily Harvest"),
+        staples=("carbonated water", "sugar", "citric acid", "fruit juice concentrate", "caffeine"),
+        serving_sizes=(250, 330, 500),
+        fat=(0.1, 0.2), carbohydrates=(10, 3), protein=(0.3, 0.3), fiber=(0.1, 0.2), sodium_mg=(20, 15),
+        sugar_share=(0.85, 1.0), saturated_share=(0.0, 0.2),
+        harmful_counts=(0.4, 0.4, 0.2), ultra_processed_counts=(0.4, 0.3, 0.2, 0.1),
+        beneficial_counts=(0.9, 0.1)
+    ),
+    "dairy": CategoryProfile(
+        categories=("dairy", "yogurt"), share=0.1,
+        adjectives=("Greek", "Strawberry", "Vanilla", "Low Fat", "Natural", "Blueberry"),
+        nouns=("Yogurt", "Kefir", "Skyr", "Fromage Frais", "Yogurt Drink"),
+        brands=("Meadow Dairy", "Green Pastures", "Healthy Choice", "Alpine Farms"),
+        staples=("milk", "cream", "sugar", "fruit preparation", "live cultures", "milk powder"),
+        serving_sizes=(125, 150, 170),
+        fat=(3.5, 2), carbohydrates=(12, 4), protein=(5, 2), fiber=(0.5, 0.5), sodium_mg=(60, 25),
+        sugar_share=(0.6, 0.95), saturated_share=(0.55, 0.7),
+        harmful_counts=(0.8, 0.15, 0.05), ultra_processed_counts=(0.5, 0.3, 0.15, 0.05),
+        beneficial_counts=(0.6, 0.3, 0.1)
+    ),
+    "bread": CategoryProfile(
+        categories=("bakery", "bread"), share=0.1,
+        adjectives=("Seeded", "Sourdough", "Multigrain", "White", "Rye", "Sandwich"),
+        nouns=("Loaf", "Bread", "Rolls", "Bagels", "Wraps", "Pita"),
+        brands=("Village Bakery", "Golden Bakery", "Stone Mill", "Natural Foods Co"),
+        staples=("wheat flour", "water", "yeast", "salt", "vegetable oil", "sugar", "sunflower seeds"),
+        serving_sizes=(35, 50, 70),
+        fat=(4, 2), carbohydrates=(45, 5), protein=(9, 2), fiber=(5, 2.5), sodium_mg=(450, 120),
+        sugar_share=(0.05, 0.12), saturated_share=(0.15, 0.3),
+        harmful_counts=(0.85, 0.12, 0.03), ultra_processed_counts=(0.4, 0.3, 0.2, 0.1),
+        beneficial_counts=(0.3, 0.4, 0.3)
+    ),
+    "ready_meals": CategoryProfile(
+        categories=("meals", "ready meals"), share=0.12,
+        adjectives=("Chicken", "Vegetable", "Beef", "Creamy", "Spicy", "Mediterranean"),
+        nouns=("Lasagne", "Curry", "Pasta Bake", "Stir Fry", "Soup", "Risotto"),
+        brands=("Quick Kitchen", "Family Table", "Chef's Pantry", "Daily Harvest"),
+        staples=("water", "chicken", "tomatoes", "pasta", "onions", "cheese", "rice", "cream", "salt"),
+        serving_sizes=(300, 350, 400),
+        fat=(8, 4), carbohydrates=(15, 5), protein=(7, 3), fiber=(2, 1), sodium_mg=(500, 200),
+        sugar_share=(0.1, 0.3), saturated_share=(0.3, 0.5),
+        harmful_counts=(0.6, 0.3, 0.1), ultra_processed_counts=(0.2, 0.3, 0.3, 0.2),
+        beneficial_counts=(0.5, 0.35, 0.15)
+    ),
+    "processed_meat": CategoryProfile(
+        categories=("meat", "processed meat"), share=0.08,
+        adjectives=("Smoked", "Honey Roast", "Peppered", "Classic", "Spicy", "Oak Smoked"),
+        nouns=("Ham", "Bacon", "Salami", "Hot Dogs", "Sausages", "Turkey Slices"),
+        brands=("Butcher's Best", "Farmhouse", "Valley Farms", "Smokehouse"),
+        staples=("pork", "water", "salt", "dextrose", "spices", "turkey", "beef"),
+        serving_sizes=(28, 50, 56),
+        fat=(20, 8), carbohydrates=(2, 2), protein=(15, 4), fiber=(0.2, 0.3), sodium_mg=(1100, 300),
+        sugar_share=(0.2, 0.9), saturated_share=(0.35, 0.45),
+        harmful_counts=(0.2, 0.4, 0.4), ultra_processed_counts=(0.3, 0.3, 0.25, 0.15),
+        beneficial_counts=(0.9, 0.1)
+    ),
+    "confectionery": CategoryProfile(
+        categories=("sweets", "confectionery"), share=0.08,
+        adjectives=("Milk Chocolate", "Dark Chocolate", "Caramel", "Peanut", "Fruit", "Mint"),
+        nouns=("Bar", "Bites", "Gummies", "Truffles", "Candy", "Wafer Bar"),
+        brands=("Sweet Valley", "Cocoa House", "Candy Co", "Golden Treats"),
+        staples=("sugar", "cocoa butter", "milk powder", "cocoa mass", "glucose syrup", "peanuts", "gelatin"),
+        serving_sizes=(40, 45, 50),
+        fat=(28, 8), carbohydrates=(58, 8), protein=(6, 2), fiber=(3, 2), sodium_mg=(80, 50),
+        sugar_share=(0.75, 0.95), saturated_share=(0.5, 0.65),
+        harmful_counts=(0.5, 0.35, 0.15), ultra_processed_counts=(0.3, 0.35, 0.25, 0.1),
+        beneficial_counts=(0.85, 0.15)
+    ),
+}
+
+def ean13(index: int) -> str:
+    """A valid EAN-13 barcode in the in-store "2" range, unique per index"""
+    digits = f"2{index:011d}"
+    checksum = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return digits + str((10 - checksum % 10) % 10)
+
+def _positive(rng: random.Random, mean_sd: Tuple[float, float]) -> float:
+    return max(0.0, rng.gauss(*mean_sd))
+
+def _draw_terms(rng: random.Random, vocabulary: Sequence[str], count_weights: Sequence[float]) -> List[str]:
+    count = rng.choices(range(len(count_weights)), weights=count_weights)[0]
+    return rng.sample(vocabulary, min(count, len(vocabulary)))
+
+def _nutrients(rng: random.Random, profile: CategoryProfile, serving: float) -> Dict[str, str]:
+    fat = _positive(rng, profile.fat)
+    carbohydrates = _positive(rng, profile.carbohydrates)
+    protein = _positive(rng, profile.protein)
+    fiber = _positive(rng, profile.fiber)
+    # Keep the macronutrients physically possible for 100g of food
+    total = fat + carbohydrates + protein + fiber
+    if total > 95:
+        fat, carbohydrates, protein, fiber = (value * 95 / total for value in (fat, carbohydrates, protein, fiber))
+    sugars = carbohydrates * rng.uniform(*profile.sugar_share)
+    saturated = fat * rng.uniform(*profile.saturated_share)
+    sodium = _positive(rng, profile.sodium_mg)
+    calories = 9 * fat + 4 * (carbohydrates + protein) + 2 * fiber
+
+    # Labels state amounts per serving
+    per_serving = serving / 100
+    return {
+        "calories": f"{calories * per_serving:.0f}kcal",
+        "total_fat": f"{fat * per_serving:.1f}g",
+        "saturated_fat": f"{saturated * per_serving:.1f}g",
+        "sodium": f"{sodium * per_serving:.0f}mg",
+        "total_carbohydrates": f"{carbohydrates * per_serving:.1f}g",
+        "dietary_fiber": f"{fiber * per_serving:.1f}g",
+        "total_sugars": f"{sugars * per_serving:.1f}g",
+        "protein": f"{protein * per_serving:.1f}g"
+    }
+
+def generate_records(count: Optional[int], seed: int = 0,
+                     categories: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+    """Yield raw product records; ``count=None`` streams without end"""
+    rng = random.Random(seed)
+    profiles = [CATEGORY_PROFILES[name] for name in (categories or CATEGORY_PROFILES)]
+    weights = [profile.share for profile in profiles]
+    # Sorted so the draw does not depend on set iteration order
+    harmful = sorted(IngredientNormalizer.HARMFUL_ADDITIVES)
+    ultra_processed = sorted(IngredientNormalizer.ULTRA_PROCESSED_MARKERS)
+    beneficial = sorted(IngredientNormalizer.BENEFICIAL_INGREDIENTS)
+
+    index = 0
+    while count is None or index < count:
+        profile = rng.choices(profiles, weights=weights)[0]
+        serving = rng.choice(profile.serving_sizes)
+
+        staples = rng.sample(profile.staples, rng.randint(2, min(5, len(profile.staples))))
+        extras = (
+            _draw_terms(rng, harmful, profile.harmful_counts)
+            + _draw_terms(rng, ultra_processed, profile.ultra_processed_counts)
+            + _draw_terms(rng, beneficial, profile.beneficial_counts)
+        )
+        rng.shuffle(extras)
+        # Labels list ingredients by weight: staples first, minor ingredients after
+        ingredients = staples[:1] + extras[:len(extras) // 3] + staples[1:] + extras[len(extras) // 3:]
+
+        yield {
+            "barcode": ean13(index),
+            "name": f"{rng.choice(profile.adjectives)} {rng.choice(profile.nouns)}",
+            "brand": rng.choice(profile.brands),
+            "ingredients": ", ".join(ingredients),
+            "serving_size_g": serving,
+            "categories": list(profile.categories),
+            "nutrients": _nutrients(rng, profile, serving)
+        }
+        index += 1
+
+def generate_products(count: Optional[int], seed: int = 0,
+                      categories: Optional[Iterable[str]] = None) -> Iterator[ProductData]:
+    """Yield normalized ProductData built from generate_records"""
+    for record in generate_records(count, seed, categories):
+        yield product_from_record(record)
+
+def write_csv(records: Iterable[Dict], f) -> int:
+    """Write raw records in batch_score.py's CSV layout; returns the count written"""
+    writer = csv.writer(f)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for record in records:
+        nutrients = record["nutrients"]
+        writer.writerow(
+            [record["barcode"], record["name"], record["brand"], record["ingredients"],
+             record["serving_size_g"], ";".join(record["categories"])]
+            + [nutrients.get(key, "") for key in NUTRIENT_KEYS]
+        )
+        count += 1
+    return count
+
+def write_jsonl(records: Iterable[Dict], f) -> int:
+    count = 0
+    for record in records:
+        f.write(json.dumps(record) + "\n")
+        count += 1
+    return count
+
+def write_database(products: Iterable[ProductData], db: ProductDatabase, scorer: Optional[HealthScorer] = None,
+                   chunk_size: int = 5000, progress: bool = False) -> int:
+    """Score products in chunks and bulk-insert them; returns the count written"""
+    scorer = scorer or HealthScorer()
+    products = iter(products)
+    count = 0
+    start = time.perf_counter()
+    while True:
+        chunk = list(islice(products, chunk_size))
+        if not chunk:
+            break
+        db.save_products(zip(chunk, scorer.score_batch(chunk)), chunk_size=chunk_size)
+        count += len(chunk)
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"\r{count:,} products written ({count / elapsed:,.0f}/s)", end="", file=sys.stderr, flush=True)
+    if progress:
+        print(file=sys.stderr)
+    return count
+
+def _open_output(path: Optional[str]):
+    if not path or path == "-":
+        return sys.stdout
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic product corpus")
+    parser.add_argument("--count", type=int, required=True, help="Products to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Same seed, same corpus")
+    parser.add_argument("--format", choices=["csv", "jsonl", "db"],
+                        help="Output format (default: from the output extension, else jsonl)")
+    parser.add_argument("--output", help="Output file, or database path for --format db "
+                                         "(default: stdout, or the config.yaml database)")
+    parser.add_argument("--categories", nargs="+", choices=sorted(CATEGORY_PROFILES), help="Only these categories")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Products scored and inserted per transaction")
+    parser.add_argument("--verbose", action="store_true", help="Log every product (DEBUG) as well as batch progress")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        name = (args.output or "")[:-3] if (args.output or "").endswith(".gz") else (args.output or "")
+        fmt = "csv" if name.endswith(".csv") else "db" if name.endswith(".db") else "jsonl"
+    configure_logging(load_config().get("logging", {}))
+    # Per-product normalization and save logs would dominate a large run, unless asked for
+    logging.getLogger("core").setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+
+    start = time.perf_counter()
+    if fmt == "db":
+        db = ProductDatabase(args.output)
+        try:
+            count = write_database(generate_products(args.count, args.seed, args.categories), db,
+                                   chunk_size=args.chunk_size, progress=True)
+        finally:
+            db.close()
+        target = db.db_path
+    else:
+        records = generate_records(args.count, args.seed, args.categories)
+        out = _open_output(args.output)
+        try:
+            count = write_csv(records, out) if fmt == "csv" else write_jsonl(records, out)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        target = args.output or "stdout"
+
+    elapsed = time.perf_counter() - start
+    print(f"Generated {count:,} products (seed {args.seed}) into {target} in {elapsed:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Label text tokenizer
+
+Extracts product name, brand, barcode, serving size, ingredients and
+nutrient rows from OCR'd label text in a single left-to-right scan.
+
+The scan runs in time linear in the length of the text whatever the input
+looks like. The lexer is one regular expression whose alternatives begin
+with disjoint character classes, so exactly one alternative can start at any
+position, and the spaces skipped before a token are always followed by one,
+so they are never given back. Each token is a single run of its class,
+giving back at most one character (the "." of a number without decimals).
+The parser does a constant amount of work per token and keeps only offsets
+into the text, so even a multi-megabyte line without a single digit, which
+made the old nutrient regex backtrack quadratically, is read once.
+
+    python label_parser.py label.txt
+"""
+
+import argparse
+import json
+import re
+import sys
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Spaces and tabs are skipped in front of every token; only their offsets
+# (a gap between two tokens) matter to the parser
+_TOKEN = re.compile(r"""
+    [^\S\n]*
+    (?:
+        (?P<word>[A-Za-z]+)
+      | (?P<number>[0-9]+(?:\.[0-9]*)?)
+      | (?P<newline>\n)
+      | (?P<colon>:)
+      | (?P<other>[^A-Za-z0-9\s:]+)
+      | (?P<end>\Z)
+    )
+""", re.VERBOSE | re.ASCII)
+
+# Units a nutrient value may carry; anything else is read as grams, as before
+NUTRIENT_UNITS = {"g": "g", "gram": "g", "grams": "g", "mg": "mg", "kcal": "kcal", "cal": "cal"}
+
+# Field labels that introduce a value instead of a nutrient row
+FIELD_LABELS = {"product name", "brand", "barcode", "serving size", "ingredients"}
+
+# Characters allowed in a product name or brand
+_NAME_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 -")
+
+@dataclass
+class LabelFields:
+    """Values found in label text; empty or None where nothing was found"""
+    name: str = ""
+    brand: str = ""
+    barcode: str = ""
+    serving_size: Optional[float] = None
+    ingredients: str = ""
+    nutrients: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+def tokenize_label(text: str) -> Iterator[Tuple[str, int, int]]:
+    """Yield (kind, start, end) for every token; whitespace other than line breaks is skipped"""
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind != "end":
+            yield kind, match.start(kind), match.end()
+
+class _NameCapture:
+    """Collects a name or brand: the run of letters, digits, spaces and hyphens after its label"""
+
+    def __init__(self):
+        self.colon = False     # Seen the optional colon after the label
+        self.start = None      # Offset where the value began
+        self.end = None        # Offset just past the value so far
+
+    def feed(self, kind: str, start: int, end: int, text: str) -> bool:
+        """Extend the value with one token; False once the value has ended"""
+        if self.start is None:
+            # An optional colon, then possibly a line break, before the value
+            if kind == "colon" and not self.colon:
+                self.colon = True
+                return True
+            if kind == "newline":
+                return True
+            if kind == "colon":
+                return False
+            self.start = start
+
+        if kind == "word":
+            self.end = end
+            return True
+        if kind in ("number", "other"):
+            stop = next((i for i in range(start, end) if text[i] not in _NAME_CHARS), end)
+            if stop > start:
+                self.end = stop
+            return stop == end
+        return False
+
+    def value(self, text: str) -> str:
+        if self.end is None:
+            return ""
+        return text[self.start:self.end].strip()
+
+class _LabelScanner:
+    """Single-pass parser over the token stream"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.fields = LabelFields()
+
+        # Nutrient row being read: a label of words, an optional colon, then a number
+        self.label_start = None
+        self.label_end = None
+        self.label_colon = False
+        self.label_newline = False
+        self.row = None              # (label, value) waiting for an optional unit
+
+        self.prev_word = ""          # Previous token, if it was a word
+        self.names: Dict[str, _NameCapture] = {}
+
+        self.serving_armed = False
+        self.serving_number = None   # Number waiting to see whether "g" follows
+        self.barcode_armed = False
+
+        # Ingredients: finished segments, plus the open one
+        self.ingredients_armed = False
+        self.ingredient_segments: List[str] = []
+        self.ingredient_start = None
+        self.ingredient_last = ""    # Last non-space character of the open segment
+        self.ingredient_depth = 0    # Unclosed parentheses
+        self.ingredient_waited = False
+
+    def scan(self) -> LabelFields:
+        for kind, start, end in tokenize_label(self.text):
+            self._token(kind, start, end)
+        self._token("newline", len(self.text), len(self.text))
+        self._finish_row()
+        self._end_ingredients(len(self.text), final=True)
+        for key, capture in self.names.items():
+            if not getattr(self.fields, key):
+                setattr(self.fields, key, capture.value(self.text))
+        return self.fields
+
+    def _token(self, kind: str, start: int, end: int):
+        word = self.text[start:end].lower() if kind == "word" else ""
+
+        # Most tokens arrive with no field waiting for a value
+        if self.names:
+            self._feed_names(kind, start, end)
+        if self.serving_armed:
+            self._feed_serving(kind, start, end, word)
+        if self.barcode_armed:
+            self._feed_barcode(kind, start, end)
+        in_ingredients = self.ingredient_start is not None and self._feed_ingredients(kind, start, end, word)
+
+        if kind == "word":
+            self._keyword(word, start, end)
+        if not in_ingredients and not self.names:
+            self._feed_row(kind, start, end, word)
+        else:
+            self._reset_row()
+
+        self.prev_word = word
+
+    def _keyword(self, word: str, start: int, end: int):
+        fields = self.fields
+        if word == "name" and self.prev_word == "product" and not fields.name and "name" not in self.names:
+            self.names["name"] = _NameCapture()
+        elif word == "brand" and not fields.brand and "brand" not in self.names:
+            self.names["brand"] = _NameCapture()
+        elif word == "barcode" and not fields.barcode:
+            self.barcode_armed = True
+        elif word == "size" and self.prev_word == "serving" and fields.serving_size is None:
+            self.serving_armed = True
+            self.serving_number = None
+        elif word == "ingredients" and not fields.ingredients and self.ingredient_start is None:
+            self.ingredients_armed = True
+            self.ingredient_start = end
+
+    def _feed_names(self, kind: str, start: int, end: int):
+        for key in list(self.names):
+            capture = self.names[key]
+            if not capture.feed(kind, start, end, self.text):
+                value = capture.value(self.text)
+                del self.names[key]
+                if value and not getattr(self.fields, key):
+                    setattr(self.fields, key, value)
+
+    def _feed_serving(self, kind: str, start: int, end: int, word: str):
+        if not self.serving_armed:
+            return
+        if kind == "number":
+            self.serving_number = self.text[start:end]
+        elif kind == "word" and self.serving_number is not None:
+            if NUTRIENT_UNITS.get(word) == "g":
+                self.fields.serving_size = float(self.serving_number)
+                self.serving_armed = False
+            self.serving_number = None
+        elif kind == "newline":
+            self.serving_armed = False
+        else:
+            self.serving_number = None
+
+    def _feed_barcode(self, kind: str, start: int, end: int):
+        if not self.barcode_armed or kind in ("colon", "newline"):
+            return
+        digits = self.text[start:end]
+        if kind == "number" and digits.isdigit() and 8 <= len(digits) <= 14:
+            self.fields.barcode = digits
+        self.barcode_armed = False
+
+    def _feed_ingredients(self, kind: str, start: int, end: int, word: str) -> bool:
+        """Track the ingredients text; True while the token belongs to it"""
+        if self.ingredient_start is None:
+            return False
+        if self.ingredients_armed:
+            # The label itself, and the colon after it, come before the list
+            if kind == "colon":
+                self.ingredient_start = end
+                self.ingredients_armed = False
+                return True
+            self.ingredients_armed = False
+
+        if kind == "word" and word == "nutrition":
+            self._end_ingredients(start, final=True)
+            return False
+        if kind == "newline":
+            self._end_ingredients(start, final=False)
+            return True
+        if kind == "other":
+            segment = self.text[start:end]
+            self.ingredient_depth += segment.count("(") - segment.count(")")
+            self.ingredient_last = segment[-1]
+        else:
+            self.ingredient_last = self.text[end - 1]
+        return True
+
+    def _end_ingredients(self, end: int, final: bool):
+        if self.ingredient_start is None:
+            return
+        segment = self.text[self.ingredient_start:end].strip()
+        if segment:
+            self.ingredient_segments.append(segment)
+        # A list wrapped by OCR continues after a trailing comma or hyphen or
+        # inside parentheses; an empty first line means the list starts below
+        wrapped = self.ingredient_last in (",", "-") or self.ingredient_depth > 0
+        starts_below = not self.ingredient_segments and not self.ingredient_waited
+        if not final and (wrapped if self.ingredient_segments else starts_below):
+            self.ingredient_start = end + 1
+            self.ingredient_last = ""
+            self.ingredient_waited = True
+            return
+        self.ingredient_start = None
+        self.ingredient_waited = False
+        if self.ingredient_segments and not self.fields.ingredients:
+            self.fields.ingredients = " ".join(self.ingredient_segments)
+        self.ingredient_segments = []
+        self.ingredient_depth = 0
+
+    def _feed_row(self, kind: str, start: int, end: int, word: str):
+        if self.row is not None:
+            label, value = self.row
+            unit = NUTRIENT_UNITS.get(word) if kind == "word" else None
+            self._emit_row(label, value, unit or "g")
+            if unit:
+                return
+
+        if kind == "word":
+            if self.label_start is not None and not self.label_colon and not self.label_newline:
+                self.label_end = end
+            else:
+                self.label_start, self.label_end = start, end
+                self.label_colon = self.label_newline = False
+        elif kind == "number":
+            # A number touching a word is part of a code such as B12 or E330
+            if self.label_start is not None and start != self.label_end:
+                label = " ".join(self.text[self.label_start:self.label_end].split())
+                self.row = (label, self.text[start:end])
+            self._reset_label()
+        elif kind == "colon":
+            if self.label_start is None or self.label_colon or self.label_newline:
+                self._reset_label()
+            else:
+                self.label_colon = True
+        elif kind == "newline":
+            # A value may sit on the line below its label
+            if self.label_start is None or self.label_newline:
+                self._reset_label()
+            else:
+                self.label_newline = True
+        elif kind == "other":
+            self._reset_label()
+
+    def _emit_row(self, label: str, value: str, unit: str):
+        self.row = None
+        if label and label.lower() not in FIELD_LABELS:
+            self.fields.nutrients[label] = f"{value}{unit}"
+
+    def _finish_row(self):
+        if self.row is not None:
+            self._emit_row(*self.row, "g")
+
+    def _reset_label(self):
+        self.label_start = self.label_end = None
+        self.label_colon = self.label_newline = False
+
+    def _reset_row(self):
+        self._finish_row()
+        self._reset_label()
+
+def parse_label_text(text: str) -> LabelFields:
+    """Extract label fields from OCR text in one linear-time pass"""
+    return _LabelScanner(text).scan()
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract fields from OCR'd label text")
+    parser.add_argument("file", nargs="?", help="Text file (default: stdin)")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+    print(json.dumps(parse_label_text(text).to_dict(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Label parser benchmark
+
+Times parse_label_text against the regular expressions photo_upload_form
+used before it, on realistic label text and on pathological OCR output
+(megabytes of letters and spaces without a digit, runs of whitespace,
+dense punctuation, repeated field labels with no values).
+
+The old nutrient regex backtracks quadratically on such input (worse on
+runs of spaces), so each old-regex measurement runs in a child process that
+is stopped after --legacy-timeout seconds. The tokenizer runs on every size
+and should show a constant throughput in MB/s.
+
+    python label_parser_benchmark.py --sizes 4096 65536 1048576 4194304 --json results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from label_parser import parse_label_text
+
+SAMPLE_LABEL = """Product Name: Crunchy Granola
+Brand: Acme Foods
+Barcode: 0123456789012
+Serving Size: 30g
+Ingredients: whole grain oats, sugar, palm oil, soy lecithin, natural flavor
+Nutrition Facts
+Calories: 140kcal
+Total Fat: 5.2g
+Saturated Fat: 1.9g
+Sodium: 120mg
+Total Sugars: 9g
+Protein: 3g
+"""
+
+def _repeat(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+# Each case builds a text of the requested size in bytes
+CASES: Dict[str, Callable[[int], str]] = {
+    "label": lambda size: _repeat(SAMPLE_LABEL, size),
+    "letters, no digits": lambda size: _repeat("lorem ipsum dolor sit amet ", size),
+    "one letter, then spaces": lambda size: "a" + " " * (size - 1),
+    "punctuation and digits": lambda size: _repeat("1.2.3,4;(5)-6%/7 ", size),
+    "labels without values": lambda size: _repeat("Brand: Serving Size: Barcode: Product Name: ", size),
+}
+
+def legacy_parse(ocr_text: str) -> Dict:
+    """The regular expressions photo_upload_form ran before the tokenizer"""
+    fields = {"ingredients": "", "nutrients": {}, "serving_size": None, "name": "", "brand": "", "barcode": ""}
+    match = re.search(r"ingredients[:]?(.+)", ocr_text, re.IGNORECASE)
+    if match:
+        fields["ingredients"] = match.group(1).split("Nutrition")[0].strip()
+    for key, value, unit in re.findall(r"([A-Za-z ]+):?\s*(\d+\.?\d*)\s*(g|mg|kcal|cal)?", ocr_text):
+        fields["nutrients"][key.strip()] = f"{value}{unit or 'g'}"
+    serving_match = re.search(r"serving size[:]?\s*(\d+\.?\d*)\s*g", ocr_text, re.IGNORECASE)
+    if serving_match:
+        fields["serving_size"] = float(serving_match.group(1))
+    name_match = re.search(r"product name[:]?\s*([A-Za-z0-9 \-]+)", ocr_text, re.IGNORECASE)
+    if name_match:
+        fields["name"] = name_match.group(1).strip()
+    brand_match = re.search(r"brand[:]?\s*([A-Za-z0-9 \-]+)", ocr_text, re.IGNORECASE)
+    if brand_match:
+        fields["brand"] = brand_match.group(1).strip()
+    barcode_match = re.search(r"barcode[:]?\s*(\d{8,14})", ocr_text, re.IGNORECASE)
+    if barcode_match:
+        fields["barcode"] = barcode_match.group(1)
+    return fields
+
+def time_parser(parse: Callable[[str], object], text: str, repeat: int) -> float:
+    """Best of ``repeat`` runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _time_legacy_worker(case: str, size: int, repeat: int, results):
+    results.put(time_parser(legacy_parse, CASES[case](size), repeat))
+
+def time_legacy(case: str, size: int, repeat: int, timeout: float) -> Optional[float]:
+    """Time the old regexes in a child process; None if they did not finish within ``timeout``"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_time_legacy_worker, args=(case, size, repeat, results), daemon=True)
+    process.start()
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return None
+    return results.get()
+
+def run_benchmark(sizes: List[int], legacy_timeout: float, repeat: int) -> List[Dict]:
+    results = []
+    for case, build in CASES.items():
+        for size in sizes:
+            text = build(size)
+            row = {"case": case, "bytes": len(text), "tokenizer_seconds": time_parser(parse_label_text, text, repeat)}
+            row["tokenizer_mb_per_second"] = len(text) / 1e6 / row["tokenizer_seconds"]
+            # Once the old regexes time out on a case, larger inputs only take longer
+            timed_out = any(r["case"] == case and r["legacy_seconds"] is None for r in results)
+            row["legacy_seconds"] = None if timed_out else time_legacy(case, size, repeat, legacy_timeout)
+            results.append(row)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the label tokenizer against the old regexes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4096, 65536, 1 << 20, 4 << 20],
+                        help="Input sizes in bytes")
+    parser.add_argument("--legacy-timeout", type=float, default=10.0,
+                        help="Seconds before an old-regex run is abandoned")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement (best is kept)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.legacy_timeout, args.repeat)
+    print(f"{'case':<26} {'bytes':>10} {'tokenizer s':>12} {'MB/s':>7} {'old regex s':>12}")
+    for row in results:
+        legacy = f"{row['legacy_seconds']:.4f}" if row["legacy_seconds"] is not None else f"> {args.legacy_timeout:g}"
+        print(f"{row['case']:<26} {row['bytes']:>10,} {row['tokenizer_seconds']:>12.4f} "
+              f"{row['tokenizer_mb_per_second']:>7.2f} {legacy:>12}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Asynchronous, rotating log output
+
+configure_logging reads the ``logging`` section of config.yaml and installs a
+single QueueHandler on the root logger. Calls on the scoring and database
+paths then only format the record and put it on an in-memory queue; a
+QueueListener thread writes it to a RotatingFileHandler (rolled over at
+``max_file_size_mb``, keeping ``backup_count`` old files) and to stderr.
+
+    configure_logging(load_config().get("logging", {}))
+
+Configuring is idempotent, so Streamlit reruns keep the one listener. The
+listener is stopped at exit, flushing whatever is still queued. A forked
+child (a ProcessPoolExecutor worker) has no listener thread and may exit
+without running atexit hooks, so it writes through the handlers directly.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
+
+DEFAULT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+def build_handlers(settings: Dict) -> List[logging.Handler]:
+    """The file and console handlers described by a ``logging`` config section"""
+    formatter = logging.Formatter(settings.get("format") or DEFAULT_FORMAT, settings.get("date_format"))
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+
+    log_file = settings.get("file", "food_rating.log")
+    if log_file:
+        handlers.append(RotatingFileHandler(
+            log_file,
+            maxBytes=int(float(settings.get("max_file_size_mb", 10)) * 1024 * 1024),
+            backupCount=int(settings.get("backup_count", 5)),
+            encoding="utf-8",
+            delay=True
+        ))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def configure_logging(settings: Optional[Dict] = None) -> QueueListener:
+    """Route the root logger through a queue to the configured handlers (once per process)"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    settings = settings or {}
+    level = logging.getLevelName(str(settings.get("level", "INFO")).upper())
+    root = logging.getLogger()
+    root.setLevel(level if isinstance(level, int) else logging.INFO)
+
+    # Unbounded, so a burst of records never blocks the caller
+    _queue_handler = QueueHandler(queue.SimpleQueue())
+    root.addHandler(_queue_handler)
+    _listener = QueueListener(_queue_handler.queue, *build_handlers(settings), respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+def _write_directly_after_fork():
+    if _listener is None or _queue_handler is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_write_directly_after_fork)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+In-process metrics registry
+
+Counters and latency histograms for the scoring hot paths, rendered in the
+Prometheus text exposition format. Functions are instrumented with the
+``timed`` decorator:
+
+    @METRICS.timed()
+    def score_product(self, product): ...
+
+Each call is then observed in the ``call_duration_seconds`` histogram,
+labelled with the function's qualified name (its ``_count`` series counts
+calls), and counted in ``errors_total`` if it raises. While the registry is
+disabled the wrapper only checks a flag before calling through, so
+instrumentation can stay in place at near-zero cost.
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Upper bounds in seconds, from 10µs (a cached lookup) to 10s (a bulk import chunk)
+DEFAULT_LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+class Histogram:
+    """Fixed-bucket histogram; counts are kept per bucket and made cumulative when rendered"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (None if empty)"""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class MetricsRegistry:
+    """Named, labelled counters and histograms shared by the whole process"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._counters: Dict[Tuple[str, Labels], Counter] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.describe("errors_total", "Calls to instrumented functions that raised")
+        self.describe("call_duration_seconds", "Wall-clock duration of instrumented functions")
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._counters:
+                self._counters[key] = Counter()
+            return self._counters[key]
+
+    def histogram(self, name: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, **labels: str) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(buckets)
+            return self._histograms[key]
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str):
+        if self.enabled:
+            self.counter(name, **labels).inc(amount)
+
+    def observe(self, name: str, value: float, **labels: str):
+        if self.enabled:
+            self.histogram(name, **labels).observe(value)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorator counting and timing calls, labelled ``function=name`` (default: qualified name)"""
+        def decorator(fn: Callable) -> Callable:
+            function = name or fn.__qualname__
+            # Resolve the series once, so a call costs no dictionary lookups
+            errors = self.counter("errors_total", function=function)
+            durations = self.histogram("call_duration_seconds", function=function)
+            clock = time.perf_counter
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = clock()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    errors.inc()
+                    raise
+                finally:
+                    durations.observe(clock() - start)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        """Zero every series, keeping the series themselves"""
+        with self._lock:
+            for counter in self._counters.values():
+                with counter._lock:
+                    counter.value = 0.0
+            for histogram in self._histograms.values():
+                with histogram._lock:
+                    histogram.counts = [0] * len(histogram.counts)
+                    histogram.sum = 0.0
+                    histogram.count = 0
+
+    def function_summary(self) -> List[Dict[str, object]]:
+        """One row per instrumented function that has been called, slowest in total first"""
+        with self._lock:
+            histograms = [(dict(labels), h) for (name, labels), h in self._histograms.items()
+                          if name == "call_duration_seconds"]
+        rows = []
+        for labels, histogram in histograms:
+            if not histogram.count:
+                continue
+            function = labels.get("function", "")
+            rows.append({
+                "function": function,
+                "calls": histogram.count,
+                "errors": int(self.counter("errors_total", function=function).value),
+                "total_seconds": histogram.sum,
+                "mean_ms": histogram.sum / histogram.count * 1000,
+                "p50_ms": histogram.quantile(0.5) * 1000,
+                "p95_ms": histogram.quantile(0.95) * 1000,
+                "p99_ms": histogram.quantile(0.99) * 1000
+            })
+        return sorted(rows, key=lambda row: row["total_seconds"], reverse=True)
+
+    def render_text(self) -> str:
+        """Every series in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = sorted(self._counters.items(), key=lambda item: item[0])
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+        lines = []
+        described = set()
+
+        def header(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), counter in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(counter.value)}")
+
+        for (name, labels), histogram in histograms:
+            header(name, "histogram")
+            with histogram._lock:
+                counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+def serve_metrics(registry: "MetricsRegistry", port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """Serve ``registry.render_text()`` at /metrics from a background thread"""
+    # Imported here, as http.server is slow to import and only needed when serving
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+# Process-wide registry used by the app's instrumentation
+METRICS = MetricsRegistry()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Label image preprocessing for OCR
+
+Phone photos of labels are usually far larger than Tesseract needs and full
+of colour and lighting noise. Downscaling to a target DPI, converting to
+grayscale, binarizing and optionally cropping to the printed area cut OCR
+time substantially and usually help accuracy.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps
+
+@dataclass(frozen=True)
+class PreprocessSettings:
+    enabled: bool = True
+    target_dpi: int = 300            # Downscale images scanned above this DPI
+    assumed_dpi: int = 300           # DPI assumed when the image does not record one
+    max_dimension: int = 2500        # Cap on the longer side, whatever DPI the image records
+    grayscale: bool = True
+    binarize: bool = True
+    threshold: Optional[int] = None  # Fixed 0-255 cut-off; None picks one with Otsu's method
+    autocrop: bool = False
+    crop_margin: int = 10            # Pixels kept around the detected text area
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict]) -> "PreprocessSettings":
+        settings = settings or {}
+        return cls(**{key: value for key, value in settings.items() if key in cls.__dataclass_fields__})
+
+def otsu_threshold(image: Image.Image) -> int:
+    """Threshold that best separates a grayscale image's dark and light pixels"""
+    histogram = image.histogram()[:256]
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+
+    best_threshold, best_variance = 127, -1.0
+    background = 0
+    weighted_background = 0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = level, variance
+    return best_threshold
+
+def _downscale_factor(image: Image.Image, settings: PreprocessSettings) -> float:
+    # Phone cameras record a nominal 72 dpi whatever the resolution, so the
+    # size cap applies even when the image has a DPI
+    dpi = image.info.get("dpi", (0, 0))[0] or settings.assumed_dpi
+    return min(settings.target_dpi / dpi, settings.max_dimension / max(image.size))
+
+def preprocess_image(image: Image.Image, settings: PreprocessSettings = PreprocessSettings()) -> Image.Image:
+    """Apply the configured downscale, grayscale, binarize and crop steps"""
+    if not settings.enabled:
+        return image
+
+    gray = settings.grayscale or settings.binarize or settings.autocrop
+    scale = _downscale_factor(image, settings)
+    if scale < 1 and image.format == "JPEG":
+        # Let the JPEG decoder skip colour conversion and shrink by a power of
+        # two while decoding, both far cheaper than doing it afterwards
+        target_width = image.width * scale
+        image.draft("L" if gray else image.mode, (round(target_width), round(image.height * scale)))
+        scale = target_width / image.width
+
+    # Honour EXIF orientation before any geometry changes
+    image = ImageOps.exif_transpose(image)
+
+    # Grayscale first so the resize filters one channel instead of three
+    if gray:
+        image = image.convert("L")
+
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # reducing_gap lets Pillow shrink by whole factors cheaply before the Lanczos pass
+        image = image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+    threshold = None
+    if settings.binarize or settings.autocrop:
+        threshold = settings.threshold if settings.threshold is not None else otsu_threshold(image)
+
+    if settings.binarize:
+        image = image.point([0 if level <= threshold else 255 for level in range(256)])
+
+    if settings.autocrop:
+        # Text is dark on light: mark dark pixels so getbbox finds the printed region
+        box = image.point([255 if level <= threshold else 0 for level in range(256)]).getbbox()
+        if box:
+            margin = settings.crop_margin
+            image = image.crop((
+                max(0, box[0] - margin), max(0, box[1] - margin),
+                min(image.width, box[2] + margin), min(image.height, box[3] + margin)
+            ))
+
+    return image
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Open Food Facts dump importer
+
+Streams products from an Open Food Facts JSONL export or CSV/TSV export
+(optionally gzip-compressed) and runs them through the product pipeline in
+batches, which classifies, scores and bulk-inserts them into the product
+database. Only one batch is held in memory at a time, and a checkpoint file
+written after every committed batch lets an interrupted import resume where
+it stopped.
+
+    python off_importer.py openfoodfacts-products.jsonl.gz --batch-size 2000
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core import (
+    OFF_NUTRIMENT_FIELDS, HealthScorer, ProductDatabase, ProductJob, build_product_pipeline,
+    load_config, product_from_open_food_facts
+)
+from logging_config import configure_logging
+from pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+# Text columns of the CSV export that product_from_open_food_facts reads
+CSV_TEXT_COLUMNS = ["product_name", "brands", "ingredients_text", "serving_size"]
+
+def open_dump(path: str):
+    """Open a dump as text, transparently decompressing .gz files"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+def iter_jsonl_records(f, skip: int = 0) -> Iterator[Optional[Tuple[str, Dict]]]:
+    """Yield (barcode, product) for each line; None for lines that cannot be used
+
+    Skipped lines are not parsed, so resuming past millions of records is cheap.
+    """
+    for line in islice(f, skip, None):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        if not isinstance(record, dict):
+            yield None
+            continue
+        code = str(record.get("code") or "").strip()
+        yield (code, record) if code else None
+
+def iter_csv_records(f, skip: int = 0) -> Iterator[Optional[Tuple[str, Dict]]]:
+    """Yield (barcode, product) for each row, rebuilding the API's nutriments dict"""
+    csv.field_size_limit(sys.maxsize)
+    header = f.readline()
+    delimiter = "\t" if header.count("\t") > header.count(",") else ","
+    columns = next(csv.reader([header], delimiter=delimiter))
+    reader = csv.DictReader(f, fieldnames=columns, delimiter=delimiter)
+
+    for row in islice(reader, skip, None):
+        code = (row.get("code") or "").strip()
+        if not code:
+            yield None
+            continue
+        record = {column: row[column] for column in CSV_TEXT_COLUMNS if row.get(column)}
+        record["nutriments"] = {
+            field: row[field] for field, _, _ in OFF_NUTRIMENT_FIELDS if row.get(field)
+        }
+        yield code, record
+
+def load_checkpoint(path: Path, dump_path: str, db_path: str) -> Dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    target = (os.path.abspath(dump_path), os.path.abspath(db_path))
+    if (checkpoint.get("dump"), checkpoint.get("database")) != target:
+        logger.warning(f"Ignoring checkpoint {path}: it belongs to another dump or database")
+        return {}
+    return checkpoint
+
+def save_checkpoint(path: Path, checkpoint: Dict):
+    """Atomically replace the checkpoint so a crash never leaves it half-written"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def process_jobs(pipeline: Pipeline, jobs: List[ProductJob]) -> List[ProductJob]:
+    """Run a batch through the pipeline, returning the jobs that made it through
+
+    Should the batch fail, its jobs are retried one at a time so a single bad
+    record is skipped instead of ending the import. Saves are upserts, so rows
+    committed before the failure are simply written again.
+    """
+    try:
+        return pipeline.process_many(jobs)
+    except Exception as e:
+        logger.warning(f"Batch of {len(jobs)} products failed ({e}); retrying them one at a time")
+
+    done = []
+    for job in jobs:
+        try:
+            result = pipeline.process(job)
+        except Exception as e:
+            logger.debug(f"Skipping product {job.product.barcode}: {e}")
+            continue
+        if result is not None:
+            done.append(result)
+    return done
+
+def import_dump(dump_path: str, db: ProductDatabase, scorer: HealthScorer, fmt: Optional[str] = None,
+                batch_size: int = 1000, checkpoint_path: Optional[Path] = None, resume: bool = True,
+                limit: Optional[int] = None, progress: bool = True) -> Dict:
+    """Import a dump, returning counts of records read, imported and skipped"""
+    fmt = fmt or detect_format(dump_path)
+    checkpoint = load_checkpoint(checkpoint_path, dump_path, db.db_path) if checkpoint_path and resume else {}
+    stats = {
+        "dump": os.path.abspath(dump_path),
+        "database": os.path.abspath(db.db_path),
+        "records": checkpoint.get("records", 0),
+        "imported": checkpoint.get("imported", 0),
+        "skipped": checkpoint.get("skipped", 0)
+    }
+    if stats["records"]:
+        print(f"Resuming after {stats['records']:,} records")
+
+    iter_records = iter_jsonl_records if fmt == "jsonl" else iter_csv_records
+    pipeline = build_product_pipeline(scorer, db, batch_size=batch_size)
+    start = time.perf_counter()
+    start_records = stats["records"]
+
+    with open_dump(dump_path) as f:
+        records = iter_records(f, skip=stats["records"])
+        if limit is not None:
+            records = islice(records, limit)
+
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+
+            jobs = []
+            for record in batch:
+                if record is None:
+                    stats["skipped"] += 1
+                    continue
+                try:
+                    jobs.append(ProductJob(product=product_from_open_food_facts(*record)))
+                except Exception as e:
+                    logger.debug(f"Skipping record {record[0]}: {e}")
+                    stats["skipped"] += 1
+
+            # Classify, score and persist the whole batch before checkpointing it
+            done = process_jobs(pipeline, jobs)
+            stats["records"] += len(batch)
+            stats["imported"] += len(done)
+            stats["skipped"] += len(jobs) - len(done)
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, stats)
+
+            if progress:
+                elapsed = time.perf_counter() - start
+                rate = (stats["records"] - start_records) / elapsed if elapsed else 0
+                print(f"\r{stats['records']:,} records, {stats['imported']:,} imported, "
+                      f"{stats['skipped']:,} skipped ({rate:,.0f} records/s)", end="", flush=True)
+
+    if progress:
+        print()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Import an Open Food Facts JSONL or CSV dump")
+    parser.add_argument("dump", help="Path to the dump (.jsonl, .csv or .tsv, optionally .gz)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Override format detection")
+    parser.add_argument("--db", help="Database path (defaults to config.yaml)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records scored and inserted per transaction")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <dump>.checkpoint.json)")
+    parser.add_argument("--no-resume", action="store_true", help="Start from the beginning, ignoring any checkpoint")
+    parser.add_argument("--limit", type=int, help="Stop after this many records")
+    parser.add_argument("--verbose", action="store_true", help="Log every product (DEBUG) as well as batch progress")
+    args = parser.parse_args()
+
+    configure_logging(load_config().get("logging", {}))
+    # Per-product normalization and save logs would dominate a bulk import, unless asked for
+    logging.getLogger("core").setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+
+    checkpoint_path = Path(args.checkpoint or f"{args.dump}.checkpoint.json")
+    db = ProductDatabase(args.db)
+    start = time.perf_counter()
+    try:
+        stats = import_dump(args.dump, db, HealthScorer(), args.format, args.batch_size,
+                            checkpoint_path, not args.no_resume, args.limit)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    print(f"Imported {stats['imported']:,} products ({stats['skipped']:,} skipped) in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
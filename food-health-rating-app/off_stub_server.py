@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Open Food Facts stand-in server
+
+Serves deterministic synthetic products on the /api/v0/product/<barcode>.json
+endpoint so OpenFoodFactsClient can be exercised and benchmarked offline.
+Latency and transient 503 errors can be injected to exercise the retry path.
+
+    python off_stub_server.py --port 8765 --latency-ms 50 --error-rate 0.1
+    python off_stub_server.py --bench 200
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openfoodfacts_client import OpenFoodFactsClient
+
+PRODUCT_PATH = re.compile(r"^/api/v0/product/(\d+)\.json$")
+
+INGREDIENTS = [
+    "whole grain oats", "sugar", "salt", "palm oil", "soy lecithin", "natural flavor",
+    "wheat flour", "high fructose corn syrup", "almonds", "sodium benzoate", "pea protein",
+    "red 40", "cocoa", "chicory root fiber", "sunflower oil", "maltodextrin"
+]
+
+def synthetic_product(barcode: str) -> dict:
+    """Build a stable fake Open Food Facts record for a barcode
+
+    Barcodes ending in 0 are reported as unknown products.
+    """
+    if barcode.endswith("0"):
+        return {"code": barcode, "status": 0, "status_verbose": "product not found"}
+
+    rng = random.Random(int(hashlib.md5(barcode.encode()).hexdigest(), 16))
+    ingredients = rng.sample(INGREDIENTS, rng.randint(3, 8))
+    return {
+        "code": barcode,
+        "status": 1,
+        "status_verbose": "product found",
+        "product": {
+            "product_name": f"Stub Product {barcode[-4:]}",
+            "brands": f"Brand{rng.randint(1, 50)}",
+            "ingredients_text": ", ".join(ingredients),
+            "serving_size": f"{rng.choice([30, 40, 50, 100])} g",
+            "nutriments": {
+                "energy-kcal_100g": rng.randint(50, 550),
+                "fat_100g": round(rng.uniform(0, 30), 1),
+                "saturated-fat_100g": round(rng.uniform(0, 12), 1),
+                "sodium_100g": round(rng.uniform(0, 900), 1),
+                "carbohydrates_100g": round(rng.uniform(0, 80), 1),
+                "fiber_100g": round(rng.uniform(0, 12), 1),
+                "sugars_100g": round(rng.uniform(0, 40), 1),
+                "proteins_100g": round(rng.uniform(0, 25), 1)
+            }
+        }
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.request_count += 1
+
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+
+        match = PRODUCT_PATH.match(self.path)
+        if not match:
+            self._send(404, {"status": 0, "status_verbose": "not found"})
+        elif server.error_rate and random.random() < server.error_rate:
+            self._send(503, {"status": 0, "status_verbose": "service unavailable"})
+        else:
+            self._send(200, synthetic_product(match.group(1)))
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(port: int = 0, latency_ms: float = 0.0, error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub server on a daemon thread; port 0 picks a free port"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.latency_ms = latency_ms
+    server.error_rate = error_rate
+    server.request_count = 0
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="off-stub", daemon=True).start()
+    return server
+
+def run_benchmark(count: int, latency_ms: float, error_rate: float, workers: int):
+    """Time cold (network) and warm (disk cache) lookups against the stub"""
+    server = start_server(latency_ms=latency_ms, error_rate=error_rate)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    cache_dir = tempfile.mkdtemp(prefix="off_cache_")
+    barcodes = [f"{4000000000000 + i * 7:013d}" for i in range(count)]
+
+    try:
+        client = OpenFoodFactsClient(base_url=base_url, pool_size=workers, backoff_factor=0.01,
+                                     cache_dir=cache_dir)
+        print(f"{count} barcodes, {workers} workers, {latency_ms:.0f}ms latency, {error_rate:.0%} errors")
+        for label in ("cold", "warm"):
+            server.request_count = 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(client.get_product, barcodes))
+            elapsed = time.perf_counter() - start
+            found = sum(1 for r in results if r is not None)
+            print(f"  {label}: {elapsed:.3f}s ({count / elapsed:.0f} lookups/s), "
+                  f"{found} found, {server.request_count} HTTP requests")
+        client.close()
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Open Food Facts stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--bench", type=int, metavar="N", help="Benchmark the client with N lookups and exit")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent lookups in benchmark mode")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_benchmark(args.bench, args.latency_ms, args.error_rate, args.workers)
+        return
+
+    server = start_server(args.port, args.latency_ms, args.error_rate)
+    print(f"Serving stub Open Food Facts API on http://127.0.0.1:{server.server_address[1]}")
+    print("Point openfoodfacts.base_url in config.yaml here to use it from the app")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
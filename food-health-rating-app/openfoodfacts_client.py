@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Open Food Facts API client
+
+Wraps the product endpoint with a pooled HTTP session, bounded retries with
+exponential backoff, and an on-disk response cache keyed by barcode.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://world.openfoodfacts.org"
+
+class OpenFoodFactsClient:
+    """Fetch product records from Open Food Facts with pooling, retries and caching"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, timeout: float = 10.0,
+                 retries: int = 3, backoff_factor: float = 0.5, pool_size: int = 10,
+                 cache_dir: Optional[str] = "off_cache", cache_ttl_seconds: float = 7 * 24 * 3600,
+                 user_agent: str = "FoodHealthRatingApp/1.0"):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_ttl_seconds = cache_ttl_seconds
+
+        # Retry connection errors and throttling/server errors; the final
+        # response is returned rather than raised so callers see its status
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, settings: Dict) -> "OpenFoodFactsClient":
+        """Build a client from the `openfoodfacts` section of config.yaml"""
+        return cls(
+            base_url=settings.get("base_url", DEFAULT_BASE_URL),
+            timeout=settings.get("timeout_seconds", 10.0),
+            retries=settings.get("retries", 3),
+            backoff_factor=settings.get("backoff_factor", 0.5),
+            pool_size=settings.get("pool_size", 10),
+            cache_dir=settings.get("cache_dir", "off_cache"),
+            cache_ttl_seconds=settings.get("cache_ttl_hours", 168) * 3600
+        )
+
+    def get_product(self, barcode: str) -> Optional[Dict]:
+        """Return the Open Food Facts product record, or None if it is unknown
+
+        Raises requests.RequestException on network or HTTP errors.
+        """
+        barcode = barcode.strip()
+        if not re.fullmatch(r"\d{1,32}", barcode):
+            raise ValueError(f"Invalid barcode: {barcode!r}")
+
+        data = self._read_cache(barcode)
+        if data is None:
+            resp = self.session.get(f"{self.base_url}/api/v0/product/{barcode}.json", timeout=self.timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            self._write_cache(barcode, data)
+
+        if data.get("status") == 1:
+            return data.get("product") or {}
+        return None
+
+    def close(self):
+        self.session.close()
+
+    def _cache_path(self, barcode: str) -> Path:
+        return self.cache_dir / f"{barcode}.json"
+
+    def _read_cache(self, barcode: str) -> Optional[Dict]:
+        if not self.cache_dir:
+            return None
+        path = self._cache_path(barcode)
+        try:
+            if time.time() - path.stat().st_mtime > self.cache_ttl_seconds:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry for {barcode}: {e}")
+            return None
+
+    def _write_cache(self, barcode: str, data: Dict):
+        if not self.cache_dir:
+            return
+        # Write to a temporary file first so readers never see a partial entry
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._cache_path(barcode))
+        except OSError as e:
+            logger.warning(f"Could not cache Open Food Facts response for {barcode}: {e}")
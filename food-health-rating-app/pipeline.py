@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Staged processing pipeline
+
+A Pipeline is an ordered list of Stages. Each stage wraps a function that
+takes one item (or, for batch stages, a list of items) and returns the
+processed item(s); returning None drops an item. The same stages can be
+driven three ways:
+
+- process(item): one item through every stage on the calling thread
+- process_many(items): a list through every stage, batch stages in batches
+- run(items): a streaming generator with worker threads per stage and
+  bounded queues between stages, so a slow stage applies backpressure
+
+Every stage keeps counters of items, calls and time spent working versus
+waiting for input or for room downstream.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+class _Failure:
+    """Carries an exception from a stage worker to the consumer of run()"""
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+class Stage:
+    """One step of a pipeline
+
+    ``workers`` threads run the stage in run(); with more than one worker the
+    stage no longer preserves item order. A ``batch_size`` makes this a batch
+    stage whose function receives and returns lists of up to that many items.
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, batch_size: Optional[int] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.items = 0
+            self.calls = 0
+            self.busy_seconds = 0.0
+            self.input_wait_seconds = 0.0
+            self.output_wait_seconds = 0.0
+
+    def apply(self, items: List) -> List:
+        """Run the stage function over a list of items, dropping None results"""
+        start = time.perf_counter()
+        if self.batch_size:
+            results = []
+            for i in range(0, len(items), self.batch_size):
+                results.extend(self.fn(items[i:i + self.batch_size]) or [])
+            calls = -(-len(items) // self.batch_size)
+        else:
+            results = [self.fn(item) for item in items]
+            calls = len(items)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.items += len(items)
+            self.calls += calls
+            self.busy_seconds += elapsed
+        return [result for result in results if result is not None]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'stage': self.name,
+                'workers': self.workers,
+                'items': self.items,
+                'calls': self.calls,
+                'busy_seconds': self.busy_seconds,
+                'input_wait_seconds': self.input_wait_seconds,
+                'output_wait_seconds': self.output_wait_seconds,
+                'items_per_second': self.items / self.busy_seconds if self.busy_seconds else 0.0
+            }
+
+class Pipeline:
+    """Ordered stages with bounded buffers between them"""
+
+    def __init__(self, stages: List[Stage], buffer_size: int = 256):
+        self.stages = stages
+        self.buffer_size = buffer_size
+
+    def process(self, item):
+        """Run one item through every stage; returns None if a stage dropped it"""
+        results = self.process_many([item])
+        return results[0] if results else None
+
+    def process_many(self, items: Iterable) -> List:
+        """Run items through the stages one stage at a time on this thread"""
+        items = list(items)
+        for stage in self.stages:
+            if not items:
+                break
+            items = stage.apply(items)
+        return items
+
+    def run(self, items: Iterable) -> Iterator:
+        """Stream items through the stages concurrently
+
+        Each stage reads from a queue holding at most ``buffer_size`` items,
+        so memory stays bounded however long ``items`` is. The first exception
+        raised by a stage is re-raised here and stops the pipeline.
+        """
+        queues = [queue.Queue(maxsize=self.buffer_size) for _ in range(len(self.stages) + 1)]
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], stop),
+                                    name="pipeline-feed", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[index], queues[index + 1], remaining, stop),
+                    name=f"pipeline-{stage.name}-{n}", daemon=True
+                ))
+        for thread in threads:
+            thread.start()
+
+        output = queues[-1]
+        try:
+            while True:
+                item = output.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise RuntimeError(f"Pipeline stage '{item.stage}' failed: {item.error}") from item.error
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def stats(self) -> List[Dict[str, float]]:
+        return [stage.stats() for stage in self.stages]
+
+    def reset_stats(self):
+        for stage in self.stages:
+            stage.reset_stats()
+
+    @staticmethod
+    def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q: queue.Queue, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _feed(self, items: Iterable, out: queue.Queue, stop: threading.Event):
+        try:
+            for item in items:
+                if not self._put(out, item, stop):
+                    return
+        except Exception as e:
+            self._put(out, _Failure("input", e), stop)
+        self._put(out, _DONE, stop)
+
+    def _work(self, stage: Stage, inbox: queue.Queue, out: queue.Queue, remaining: List[int],
+              stop: threading.Event):
+        done = False
+        while not done:
+            wait_start = time.perf_counter()
+            batch = [self._get(inbox, stop)]
+            # Batch stages fill a whole batch unless the stream ends first
+            while batch[-1] is not _DONE and len(batch) < (stage.batch_size or 1):
+                batch.append(self._get(inbox, stop))
+            waited = time.perf_counter() - wait_start
+
+            if batch[-1] is _DONE:
+                batch.pop()
+                done = True
+            failures = [item for item in batch if isinstance(item, _Failure)]
+            batch = [item for item in batch if not isinstance(item, _Failure)]
+
+            try:
+                results = stage.apply(batch) if batch else []
+            except Exception as e:
+                results = [_Failure(stage.name, e)]
+
+            wait_start = time.perf_counter()
+            for result in failures + results:
+                if not self._put(out, result, stop):
+                    return
+            with stage._lock:
+                stage.input_wait_seconds += waited
+                stage.output_wait_seconds += time.perf_counter() - wait_start
+
+        # Let sibling workers see the end of the stream; the last one forwards it
+        self._put(inbox, _DONE, stop)
+        with stage._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            self._put(out, _DONE, stop)
@@ -12,7 +12,7 @@ from datetime import datetime
 from pathlib import Path
 
 # Import our app components
-from app import (
+from core import (
     ProductData, HealthScore, IngredientNormalizer, 
     NutrientNormalizer, HealthScorer, ProductDatabase
 )
@@ -123,18 +123,16 @@ def run_complete_analysis():
     print("\n📦 Creating sample products...")
     products = create_sample_products()
     
+    # Score all products, then save them in a single transaction
+    scores = scorer.score_batch(products)
+    data_hashes = db.save_products(zip(products, scores))
+    
     # Analyze each product
     results = []
-    for i, product in enumerate(products, 1):
+    for i, (product, score, data_hash) in enumerate(zip(products, scores, data_hashes), 1):
         print(f"\n🔍 Analyzing Product {i}: {product.name}")
         print("-" * 40)
         
-        # Generate score
-        score = scorer.score_product(product)
-        
-        # Save to database
-        data_hash = db.save_product(product, score)
-        
         # Create analysis trace
         trace = {
             "timestamp": datetime.now().isoformat(),
@@ -366,7 +364,6 @@ Generated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
     print(f"📁 Outputs: {output_dir}/ directory")
     print(f"📊 Average Score: {log_summary['average_score']:.1f}/100")
     print(f"📚 Sources: sources_snapshot.json")
-    print(f"📝 Logs: food_rating.log")
     
     print("\n🚀 Next Steps:")
     print("1. Run: streamlit run app.py")
@@ -383,7 +380,6 @@ def validate_outputs():
     
     required_files = [
         "products.db",
-        "food_rating.log", 
         "sources_snapshot.json",
         "sample_outputs/product_1.json",
         "sample_outputs/product_2.json",
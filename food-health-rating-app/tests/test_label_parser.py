@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from label_parser import parse_label_text
+from label_parser_benchmark import CASES, SAMPLE_LABEL
+
+# Megabytes of pathological OCR output; the regexes the tokenizer replaced
+# did not finish 64 KB of some of these in 10 seconds
+PATHOLOGICAL_BYTES = 4 << 20
+PATHOLOGICAL_SECONDS = 15
+
+def test_sample_label_fields():
+    fields = parse_label_text(SAMPLE_LABEL)
+    assert fields.name == "Crunchy Granola"
+    assert fields.brand == "Acme Foods"
+    assert fields.barcode == "0123456789012"
+    assert fields.serving_size == 30.0
+    assert fields.ingredients == "whole grain oats, sugar, palm oil, soy lecithin, natural flavor"
+    assert fields.nutrients == {
+        "Calories": "140kcal",
+        "Total Fat": "5.2g",
+        "Saturated Fat": "1.9g",
+        "Sodium": "120mg",
+        "Total Sugars": "9g",
+        "Protein": "3g",
+    }
+
+@pytest.mark.parametrize("text, expected", [
+    ("Ingredients: water, sugar,\nsalt, yeast\nNutrition Facts", "water, sugar, salt, yeast"),
+    ("Ingredients: wheat flour (wheat,\nniacin), sugar\nNutrition Facts", "wheat flour (wheat, niacin), sugar"),
+    ("Ingredients: sugar -\nsalt\nNutrition Facts", "sugar - salt"),
+    ("Ingredients:\nwheat flour, sugar\nCalories 100", "wheat flour, sugar"),
+])
+def test_wrapped_ingredients_are_joined(text, expected):
+    assert parse_label_text(text).ingredients == expected
+
+def test_ingredients_end_at_the_next_line_without_a_continuation():
+    fields = parse_label_text("Ingredients: oats, sugar\nNutritional yeast flakes\nProtein: 3g")
+    assert fields.ingredients == "oats, sugar"
+    assert fields.nutrients == {"Protein": "3g"}
+
+def test_ingredients_keep_words_starting_with_nutrition():
+    fields = parse_label_text("Ingredients: oats, nutritional yeast, salt\nNutrition Facts\nProtein: 3g")
+    assert fields.ingredients == "oats, nutritional yeast, salt"
+
+def test_codes_are_not_nutrient_rows():
+    fields = parse_label_text(
+        "Ingredients: water, acid (E330), vitamin B12\nNutrition Facts\nVitamin B12 2mcg\nSodium: 120mg"
+    )
+    assert fields.ingredients == "water, acid (E330), vitamin B12"
+    assert fields.nutrients == {"Sodium": "120mg"}
+
+def test_field_labels_are_not_nutrients():
+    fields = parse_label_text("Serving Size: 30g\nBarcode: 12345678\nProduct Name: Oat Bar 2\nProtein: 3g")
+    assert fields.serving_size == 30.0
+    assert fields.barcode == "12345678"
+    assert fields.nutrients == {"Protein": "3g"}
+
+@pytest.mark.parametrize("case", [
+    "letters, no digits", "one letter, then spaces", "punctuation and digits", "labels without values"
+])
+def test_pathological_input_parses_in_linear_time(case):
+    text = CASES[case](PATHOLOGICAL_BYTES)
+    start = time.perf_counter()
+    fields = parse_label_text(text)
+    elapsed = time.perf_counter() - start
+    assert elapsed < PATHOLOGICAL_SECONDS, f"{case}: {elapsed:.1f}s for {len(text):,} bytes"
+    assert fields.nutrients == {}
+    assert fields.ingredients == ""
+
+def test_repeated_labels_parse_in_linear_time():
+    text = CASES["label"](PATHOLOGICAL_BYTES)
+    start = time.perf_counter()
+    fields = parse_label_text(text)
+    assert time.perf_counter() - start < PATHOLOGICAL_SECONDS
+    assert fields.name == "Crunchy Granola"
+    assert fields.nutrients["Protein"] == "3g"